@@ -1,4 +1,5 @@
 import requests
+import httpx
 import json
 from typing import Dict, Any, Optional
 
@@ -11,9 +12,9 @@ class LinkedInTool:
         self.access_token = access_token
         self.user_id = user_id
         self.base_url = "https://api.linkedin.com/v2"
+        self._async_http = None  # httpx.AsyncClient, created on first async request
 
-    def post_content(self, content: str) -> Dict:
-        """Post content directly to LinkedIn's UGC API."""
+    def _post_request(self, content: str):
         url = f"{self.base_url}/ugcPosts"
         headers = {
             "Authorization": f"Bearer {self.access_token}",
@@ -33,9 +34,9 @@ class LinkedInTool:
                 "com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"
             }
         }
-        
-        response = requests.post(url, headers=headers, json=payload)
-        
+        return url, headers, payload
+
+    def _parse_post_response(self, response) -> Dict:
         if response.status_code == 201:
             return {"status": "success", "message": "Successfully posted on LinkedIn!"}
         else:
@@ -44,4 +45,23 @@ class LinkedInTool:
             except json.JSONDecodeError:
                 error_details = {"message": response.text}
             
-            return {"status": "error", "message": f"LinkedIn API Error ({response.status_code}): {error_details.get('message', 'Unknown Error')}"}
\ No newline at end of file
+            return {"status": "error", "message": f"LinkedIn API Error ({response.status_code}): {error_details.get('message', 'Unknown Error')}"}
+
+    def post_content(self, content: str) -> Dict:
+        """Post content directly to LinkedIn's UGC API."""
+        url, headers, payload = self._post_request(content)
+        response = requests.post(url, headers=headers, json=payload)
+        return self._parse_post_response(response)
+
+    async def apost_content(self, content: str) -> Dict:
+        """Async variant of post_content using a pooled httpx client."""
+        if self._async_http is None:
+            self._async_http = httpx.AsyncClient(timeout=30)
+        url, headers, payload = self._post_request(content)
+        response = await self._async_http.post(url, headers=headers, json=payload)
+        return self._parse_post_response(response)
+
+    async def aclose(self):
+        if self._async_http is not None:
+            await self._async_http.aclose()
+            self._async_http = None
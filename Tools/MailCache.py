@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional
+
+DEFAULT_DB = "data/mail_cache.db"
+
+# Body MailTool returns for a message it could not decode; such messages are never cached
+EXTRACTION_ERROR = "Error extracting content"
+
+# Bumped whenever SCHEMA changes incompatibly; see MailCache._migrate
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS message_content (
+    account TEXT NOT NULL,
+    id TEXT NOT NULL,
+    thread_id TEXT,
+    headers TEXT NOT NULL,
+    body TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (account, id)
+);
+CREATE TABLE IF NOT EXISTS message_labels (
+    account TEXT NOT NULL,
+    id TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (account, id)
+);
+CREATE INDEX IF NOT EXISTS idx_content_access ON message_content (last_access);
+"""
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+class MailCache:
+    """
+    On-disk LRU cache of parsed Gmail messages, shared by every MailTool of the process.
+
+    A Gmail message's content never changes once it exists, so parsed headers and the decoded
+    body are kept until the cache outgrows `max_bytes`, then the least recently read messages
+    are evicted. Labels change (read/unread, archived) and are kept in their own table, so
+    updating them never touches the content; since they can also change in other Gmail clients,
+    labels older than `label_ttl` seconds are returned as None for the caller to refresh.
+    Entries are namespaced by the account's email.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB, max_bytes=50 * 1024 * 1024, label_ttl=300):
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.label_ttl = label_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # A lost write only means one more download
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _migrate(self):
+        """Brings a cache written by an older SCHEMA_VERSION up to date without dropping its content."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                # v1 label rows have no timestamp: drop them and let them be refetched
+                self._conn.execute("DROP TABLE IF EXISTS message_labels")
+                for statement in SCHEMA.split(";"):
+                    if statement.strip():
+                        self._conn.execute(statement)
+                # v1 counted characters, not bytes, and cached bodies that failed to decode
+                self._conn.execute(
+                    "UPDATE message_content SET size = length(CAST(headers AS BLOB)) + length(CAST(body AS BLOB))"
+                )
+                self._conn.execute("DELETE FROM message_content WHERE body = ?", (EXTRACTION_ERROR,))
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    @classmethod
+    def shared(cls, db_path=DEFAULT_DB):
+        """One cache (and connection) per database file for the whole process."""
+        path = os.path.abspath(db_path)
+        with _shared_lock:
+            if path not in _shared:
+                _shared[path] = cls(db_path=db_path)
+            return _shared[path]
+
+    def get_many(self, account: str, message_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Cached messages among `message_ids` as {id: {"id", "thread_id", "headers", "body", "labels"}}.
+        "labels" is None when they are older than label_ttl (see put_labels).
+        """
+        if not message_ids:
+            return {}
+        found = {}
+        fresh_since = time.time() - self.label_ttl
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(message_ids), 500):
+                chunk = message_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    "SELECT c.id, c.thread_id, c.headers, c.body, l.labels, l.updated FROM message_content c "
+                    "LEFT JOIN message_labels l ON l.account = c.account AND l.id = c.id "
+                    f"WHERE c.account = ? AND c.id IN ({placeholders})",
+                    [account] + chunk
+                ).fetchall()
+                for message_id, thread_id, headers, body, labels, updated in rows:
+                    found[message_id] = {
+                        "id": message_id, "thread_id": thread_id, "headers": json.loads(headers),
+                        "body": body, "labels": json.loads(labels) if labels and updated >= fresh_since else None
+                    }
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE message_content SET last_access = ? WHERE account = ? AND id = ?",
+                    [(now, account, message_id) for message_id in found]
+                )
+        self.stats["hits"] += len(found)
+        self.stats["misses"] += len(message_ids) - len(found)
+        return found
+
+    def put_many(self, account: str, messages: List[Dict]):
+        """
+        Stores parsed messages (see get_many for the shape), then evicts down to max_bytes if needed.
+        Messages whose body failed to decode are skipped, so the next read fetches them again.
+        """
+        messages = [message for message in messages if message["body"] != EXTRACTION_ERROR]
+        if not messages:
+            return
+        now = time.time()
+        content, labels = [], []
+        for message in messages:
+            headers = json.dumps(message["headers"], ensure_ascii=False)
+            content.append((
+                account, message["id"], message.get("thread_id"), headers, message["body"],
+                len(headers.encode("utf-8")) + len(message["body"].encode("utf-8")), now
+            ))
+            labels.append((account, message["id"], json.dumps(message.get("labels") or []), now))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO message_content (account, id, thread_id, headers, body, size, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    content
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO message_labels (account, id, labels, updated) VALUES (?, ?, ?, ?)", labels
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._evict()
+
+    def put_labels(self, account: str, labels: Dict[str, List[str]]):
+        """Replaces the labels of cached messages ({id: label ids}) and marks them fresh."""
+        if not labels:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO message_labels (account, id, labels, updated) VALUES (?, ?, ?, ?)",
+                [(account, message_id, json.dumps(label_ids), now) for message_id, label_ids in labels.items()]
+            )
+
+    def update_labels(self, account: str, message_id: str, add: Optional[List[str]] = None, remove: Optional[List[str]] = None):
+        """Applies a label change to a cached message (no-op if it is not cached)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT labels FROM message_labels WHERE account = ? AND id = ?", (account, message_id)
+            ).fetchone()
+            if not row:
+                return
+            labels = [label for label in json.loads(row[0]) if label not in (remove or [])]
+            labels += [label for label in (add or []) if label not in labels]
+            self._conn.execute(
+                "UPDATE message_labels SET labels = ?, updated = ? WHERE account = ? AND id = ?",
+                (json.dumps(labels), time.time(), account, message_id)
+            )
+
+    def _evict(self):
+        """Drops least recently read messages until the cache is back under 90% of max_bytes."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM message_content").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        evicted = 0
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for account, message_id, size in self._conn.execute(
+                "SELECT account, id, size FROM message_content ORDER BY last_access"
+            ).fetchall():
+                if total <= target:
+                    break
+                self._conn.execute("DELETE FROM message_content WHERE account = ? AND id = ?", (account, message_id))
+                self._conn.execute("DELETE FROM message_labels WHERE account = ? AND id = ?", (account, message_id))
+                total -= size
+                evicted += 1
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self.stats["evictions"] += evicted
+        logging.info(f"🔄 Evicted {evicted} cached messages from {self.db_path}.")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
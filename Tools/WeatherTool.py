@@ -1,4 +1,6 @@
+import asyncio
 import requests
+import httpx
 import geocoder
 from geopy.geocoders import Nominatim
 from typing import Optional, Dict, Union
@@ -9,6 +11,17 @@ import pytz
 class WeatherTool:
     def __init__(self):
         self.geolocator = Nominatim(user_agent="wingman_weather_agent")
+        self._async_http = None  # httpx.AsyncClient, created on first async request
+
+    def _get_async_http(self) -> httpx.AsyncClient:
+        if self._async_http is None:
+            self._async_http = httpx.AsyncClient(timeout=10)
+        return self._async_http
+
+    async def aclose(self):
+        if self._async_http is not None:
+            await self._async_http.aclose()
+            self._async_http = None
 
     def figure_out_location(self, location_data: dict) -> Optional[Dict[str, float]]:
         """Determine coordinates based on whether current location is requested or a specific location is provided."""
@@ -47,33 +60,52 @@ class WeatherTool:
             print(f"Error fetching coordinates: {e}")
             return None
 
-    def get_weather(self, latitude: float, longitude: float) -> Dict[str, Union[float, str]]:
-        """Get weather data for provided GPS coordinates."""
-        # Get timezone for the location
-        timezone = self._get_timezone(latitude, longitude)
-        
+    async def afigure_out_location(self, location_data: dict) -> Optional[Dict[str, float]]:
+        """Async variant of figure_out_location; the geocoding libraries are blocking, so they run on a worker thread."""
+        return await asyncio.to_thread(self.figure_out_location, location_data)
+
+    def _weather_url(self, latitude: float, longitude: float, timezone: str) -> str:
         # Add timezone and time parameters to the API call
-        url = (
+        return (
             f"https://api.open-meteo.com/v1/forecast"
             f"?latitude={latitude}&longitude={longitude}"
             f"&current=temperature_2m,cloudcover,precipitation,rain,relative_humidity_2m,wind_speed_10m,weather_code"
             f"&timezone={timezone}"
         )
 
+    def _parse_weather(self, data: dict, timezone: str) -> Dict[str, Union[float, str]]:
+        if "current" in data:
+            # Add local time to the response
+            current_data = data["current"]
+            current_data["local_time"] = datetime.now(pytz.timezone(timezone)).strftime("%I:%M %p")
+            return current_data
+        return {"error": "Unexpected API response format"}
+
+    def get_weather(self, latitude: float, longitude: float) -> Dict[str, Union[float, str]]:
+        """Get weather data for provided GPS coordinates."""
+        # Get timezone for the location
+        timezone = self._get_timezone(latitude, longitude)
+        url = self._weather_url(latitude, longitude, timezone)
+
         try:
             response = requests.get(url)
             response.raise_for_status()
-            data = response.json()
-
-            if "current" in data:
-                # Add local time to the response
-                current_data = data["current"]
-                current_data["local_time"] = datetime.now(pytz.timezone(timezone)).strftime("%I:%M %p")
-                return current_data
-            return {"error": "Unexpected API response format"}
+            return self._parse_weather(response.json(), timezone)
         except requests.exceptions.RequestException as e:
             return {"error": f"Error fetching weather data: {e}"}
 
+    async def aget_weather(self, latitude: float, longitude: float) -> Dict[str, Union[float, str]]:
+        """Async variant of get_weather using a pooled httpx client."""
+        timezone = await self._aget_timezone(latitude, longitude)
+        url = self._weather_url(latitude, longitude, timezone)
+
+        try:
+            response = await self._get_async_http().get(url)
+            response.raise_for_status()
+            return self._parse_weather(response.json(), timezone)
+        except httpx.HTTPError as e:
+            return {"error": f"Error fetching weather data: {e}"}
+
     def _get_timezone(self, latitude: float, longitude: float) -> str:
         """Get timezone string for given coordinates."""
         try:
@@ -89,4 +121,15 @@ class WeatherTool:
             return "UTC"
         except:
             # Default to UTC in case of any error
-            return "UTC"
\ No newline at end of file
+            return "UTC"
+
+    async def _aget_timezone(self, latitude: float, longitude: float) -> str:
+        """Async variant of _get_timezone."""
+        try:
+            url = f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}&timezone=auto"
+            response = await self._get_async_http().get(url)
+            response.raise_for_status()
+            return response.json().get("timezone", "UTC")
+        except Exception:
+            # Default to UTC in case of any error
+            return "UTC"
@@ -1,21 +1,17 @@
 import os
 from typing import Dict, List, Optional
 import requests
+import httpx
 from dotenv import load_dotenv
-import json
+from config.config_loader import tavily_api_key
 
 # Load environment variables
 load_dotenv()
 
 class WebSearchTool:
     def __init__(self):
-        # 1. Load keys from JSON
-        try:
-            with open("config/client_secret.json", "r") as f:
-                secrets = json.load(f)
-                self.api_key = secrets.get("tavily", {}).get("api_key")
-        except FileNotFoundError:
-            self.api_key = None
+        # 1. Load keys from client_secret.json (parsed once per process)
+        self.api_key = tavily_api_key()
             
         # 2. Set availability based on the key
         self.available = bool(self.api_key) 
@@ -23,6 +19,33 @@ class WebSearchTool:
             print("⚠️ WARNING: TAVILY API key missing from client_secret.json. Web search disabled.")
             
         self.base_url = "https://api.tavily.com/search"
+        self._async_http = None  # httpx.AsyncClient, created on first async request
+
+    def _get_async_http(self) -> httpx.AsyncClient:
+        if self._async_http is None:
+            self._async_http = httpx.AsyncClient(timeout=30)
+        return self._async_http
+
+    async def aclose(self):
+        if self._async_http is not None:
+            await self._async_http.aclose()
+            self._async_http = None
+
+    def _request_parts(self, query: str, search_depth: str):
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        
+        data = {
+            "query": query,
+            "search_depth": search_depth,
+            "include_images": False,
+            "include_answer": True,
+            "max_results": 5,
+            "api_key": self.api_key
+        }
+        return headers, data
 
     def search(self, query: str, search_depth: str = "basic") -> Dict:
         if not self.available:
@@ -39,19 +62,7 @@ class WebSearchTool:
             Dict containing search results and metadata
         """
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            data = {
-                "query": query,
-                "search_depth": search_depth,
-                "include_images": False,
-                "include_answer": True,
-                "max_results": 5,
-                "api_key": self.api_key
-            }
+            headers, data = self._request_parts(query, search_depth)
             
             response = requests.post(
                 self.base_url,
@@ -101,27 +112,7 @@ class WebSearchTool:
             Dict containing the answer and source
         """
         try:
-            result = self.search(query, search_depth="basic")
-            
-            if "answer" in result and result["answer"]:
-                return {
-                    "answer": result["answer"],
-                    "source": result.get("results", [{}])[0].get("url", "Unknown source")
-                }
-            
-            if result.get("results"):
-                first_result = result["results"][0]
-                return {
-                    "answer": first_result.get("snippet", "No direct answer available"),
-                    "source": first_result.get("url", "Unknown source")
-                }
-            
-            return {
-                "answer": None,
-                "source": None,
-                "error": "No quick answer available"
-            }
-            
+            return self._quick_answer_from(self.search(query, search_depth="basic"))
         except Exception as e:
             print(f"Quick answer error: {str(e)}")
             return {
@@ -130,6 +121,26 @@ class WebSearchTool:
                 "error": f"Quick answer failed: {str(e)}"
             }
 
+    def _quick_answer_from(self, result: Dict) -> Dict:
+        if "answer" in result and result["answer"]:
+            return {
+                "answer": result["answer"],
+                "source": result.get("results", [{}])[0].get("url", "Unknown source")
+            }
+        
+        if result.get("results"):
+            first_result = result["results"][0]
+            return {
+                "answer": first_result.get("snippet", "No direct answer available"),
+                "source": first_result.get("url", "Unknown source")
+            }
+        
+        return {
+            "answer": None,
+            "source": None,
+            "error": "No quick answer available"
+        }
+
     def get_detailed_search(self, query: str) -> Dict:
         """
         Perform a detailed search for complex queries.
@@ -141,23 +152,71 @@ class WebSearchTool:
             Dict containing detailed search results
         """
         try:
-            result = self.search(query, search_depth="deep")
-            
-            if "results" in result and result["results"]:
-                return {
-                    "results": result["results"],
-                    "answer": result.get("answer"),
-                    "topic": query
-                }
-            
+            return self._detailed_from(self.search(query, search_depth="deep"), query)
+        except Exception as e:
+            print(f"Detailed search error: {str(e)}")
             return {
-                "error": "No results found",
+                "error": f"Detailed search failed: {str(e)}",
+                "results": []
+            }
+
+    def _detailed_from(self, result: Dict, query: str) -> Dict:
+        if "results" in result and result["results"]:
+            return {
+                "results": result["results"],
+                "answer": result.get("answer"),
+                "topic": query
+            }
+        
+        return {
+            "error": "No results found",
+            "results": []
+        }
+
+    # -------------------- Async variants (pooled httpx client) --------------------
+
+    async def asearch(self, query: str, search_depth: str = "basic") -> Dict:
+        """Async variant of search."""
+        if not self.available:
+            return {"error": "TAVILY_API_KEY is not configured.", "results": []}
+
+        try:
+            headers, data = self._request_parts(query, search_depth)
+            response = await self._get_async_http().post(self.base_url, headers=headers, json=data)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            print(f"Search error: {str(e)}")
+            return {
+                "error": f"Search failed: {str(e)}",
                 "results": []
             }
-            
+        except Exception as e:
+            print(f"Unexpected error: {str(e)}")
+            return {
+                "error": f"Unexpected error: {str(e)}",
+                "results": []
+            }
+
+    async def aget_quick_answer(self, query: str) -> Dict:
+        """Async variant of get_quick_answer."""
+        try:
+            return self._quick_answer_from(await self.asearch(query, search_depth="basic"))
+        except Exception as e:
+            print(f"Quick answer error: {str(e)}")
+            return {
+                "answer": None,
+                "source": None,
+                "error": f"Quick answer failed: {str(e)}"
+            }
+
+    async def aget_detailed_search(self, query: str) -> Dict:
+        """Async variant of get_detailed_search."""
+        try:
+            return self._detailed_from(await self.asearch(query, search_depth="deep"), query)
         except Exception as e:
             print(f"Detailed search error: {str(e)}")
             return {
                 "error": f"Detailed search failed: {str(e)}",
                 "results": []
-            } 
\ No newline at end of file
+            }
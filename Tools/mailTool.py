@@ -8,16 +8,32 @@ from email.mime.text import MIMEText
 import base64
 from typing import List, Dict, Optional
 import re # Keep re for email parsing
+import time
 from datetime import datetime, timedelta
+from Tools.MailCache import EXTRACTION_ERROR, MailCache
+
+# Per-message statuses inside a batch that are worth one retry (rate limiting, transient errors)
+RETRIABLE_STATUSES = {429, 500, 503}
 
 class MailTool:
+    # Gmail accepts up to 100 calls per batch request but recommends at most 50 to avoid rate limiting
+    BATCH_SIZE = 50
+
     # 1. CRITICAL: Accept Credentials object
-    def __init__(self, credentials: Credentials): 
+    def __init__(self, credentials: Credentials, cache: bool = True): 
         """Initialize with a guaranteed valid Credentials object."""
         self.credentials = credentials
         self.service = self._get_service()
         self._contact_cache = {} 
         self.last_error = None
+        # Parsed messages are cached on disk per account (the profile email, looked up once)
+        self._account = None
+        self.message_cache = None
+        if cache:
+            try:
+                self.message_cache = MailCache.shared()
+            except Exception as e:
+                logging.warning(f"Gmail message cache unavailable, fetching everything from the API: {e}")
 
     # 2. Simplied _get_service
     def _get_service(self):
@@ -54,6 +70,108 @@ class MailTool:
             logging.error(f"Error sending email: {e}")
             return False
             
+    def _get_messages(self, message_ids, format="full", metadata_headers=None) -> List[Dict]:
+        """
+        Fetches messages with Gmail batch requests: one HTTP round trip per BATCH_SIZE ids instead
+        of one messages().get() call each. Returns them in the order of message_ids; a message that
+        fails is logged and left out (rate-limited ones are retried once).
+        """
+        started = time.perf_counter()
+        fetched = {}
+        pending = list(message_ids)
+        round_trips = 0
+
+        for attempt in range(2):
+            retry = []
+
+            def on_response(request_id, response, exception):
+                if exception is None:
+                    fetched[request_id] = response
+                elif attempt == 0 and getattr(getattr(exception, "resp", None), "status", None) in RETRIABLE_STATUSES:
+                    retry.append(request_id)
+                else:
+                    logging.warning(f"Could not fetch message {request_id}: {exception}")
+
+            for start in range(0, len(pending), self.BATCH_SIZE):
+                batch = self.service.new_batch_http_request(callback=on_response)
+                for message_id in pending[start:start + self.BATCH_SIZE]:
+                    request = {"userId": "me", "id": message_id, "format": format}
+                    if metadata_headers:
+                        request["metadataHeaders"] = metadata_headers
+                    batch.add(self.service.users().messages().get(**request), request_id=message_id)
+                batch.execute()
+                round_trips += 1
+
+            if not retry:
+                break
+            time.sleep(1)
+            pending = retry
+
+        logging.info(
+            f"Fetched {len(fetched)}/{len(message_ids)} messages in {round_trips} batch request(s), "
+            f"{(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+        return [fetched[message_id] for message_id in message_ids if message_id in fetched]
+
+    def _get_parsed_messages(self, message_ids, format="full", metadata_headers=None) -> List[Dict]:
+        """
+        Parsed messages (see _parse_message) in the order of message_ids: cached ones come from the
+        message cache, the rest are batch-fetched. Only full fetches are cached, since metadata
+        fetches lack the body. Cached messages whose labels went stale get them refreshed with
+        one format='minimal' batch fetch, which carries the label ids but no content.
+        """
+        found = {}
+        account = None
+        if self.message_cache is not None and message_ids:
+            try:
+                account = self._account_email()
+                found = self.message_cache.get_many(account, list(message_ids))
+            except Exception as e:
+                logging.warning(f"Gmail message cache lookup failed: {e}")
+
+        stale = [message_id for message_id, message in found.items() if message["labels"] is None]
+        if stale:
+            labels = {msg["id"]: msg.get("labelIds", []) for msg in self._get_messages(stale, format="minimal")}
+            for message_id in stale:
+                found[message_id]["labels"] = labels.get(message_id, [])
+            try:
+                self.message_cache.put_labels(account, labels)
+            except Exception as e:
+                logging.warning(f"Could not cache Gmail labels: {e}")
+
+        missing = [message_id for message_id in message_ids if message_id not in found]
+        if missing:
+            fetched = [
+                self._parse_message(msg, with_body=format == "full")
+                for msg in self._get_messages(missing, format=format, metadata_headers=metadata_headers)
+            ]
+            if account and format == "full":
+                try:
+                    self.message_cache.put_many(account, fetched)
+                except Exception as e:
+                    logging.warning(f"Could not cache Gmail messages: {e}")
+            found.update((message["id"], message) for message in fetched)
+        return [found[message_id] for message_id in message_ids if message_id in found]
+
+    def _account_email(self) -> str:
+        if self._account is None:
+            self._account = self.service.users().getProfile(userId='me').execute()['emailAddress']
+        return self._account
+
+    def _parse_message(self, msg, with_body=True) -> Dict:
+        """The parts of a Gmail message the read paths use: id, thread, headers, decoded body and labels."""
+        return {
+            "id": msg["id"],
+            "thread_id": msg.get("threadId"),
+            "headers": [[h["name"], h["value"]] for h in msg.get("payload", {}).get("headers", [])],
+            "body": self._get_email_body(msg) if with_body else "",
+            "labels": msg.get("labelIds", [])
+        }
+
+    @staticmethod
+    def _header(parsed, name, default=""):
+        return next((value for header, value in parsed["headers"] if header.lower() == name.lower()), default)
+
     # ... All other methods must be checked for self.authenticate() calls and reliance on old token logic.
     # The complexity of the other methods is okay, as long as authentication is clean.
     # For now, we will assume self.service usage is correct in the original code, 
@@ -72,12 +190,8 @@ class MailTool:
             messages = results.get("messages", [])
             email_data = []
 
-            for msg in messages:
-                msg_data = self.service.users().messages().get(
-                    userId="me", id=msg["id"]
-                ).execute()
-                
-                email = self._extract_email_parts(msg_data)
+            for parsed in self._get_parsed_messages([msg["id"] for msg in messages]):
+                email = self._email_from_parsed(parsed)
                 email_data.append(email)
 
             return email_data
@@ -101,21 +215,14 @@ class MailTool:
             messages = results.get('messages', [])
             emails = []
             
-            for message in messages:
-                msg = service.users().messages().get(
-                    userId='me',
-                    id=message['id'],
-                    format='full'
-                ).execute()
-                
+            for msg in self._get_parsed_messages([message['id'] for message in messages], format='full'):
                 # Extract email details
-                headers = msg['payload']['headers']
                 email_data = {
-                    'id': message['id'],
-                    'sender': next((h['value'] for h in headers if h['name'].lower() == 'from'), 'Unknown'),
-                    'subject': next((h['value'] for h in headers if h['name'].lower() == 'subject'), 'No Subject'),
-                    'body': self._get_email_body(msg),
-                    'thread_id': msg['threadId']
+                    'id': msg['id'],
+                    'sender': self._header(msg, 'from', 'Unknown'),
+                    'subject': self._header(msg, 'subject', 'No Subject'),
+                    'body': msg['body'],
+                    'thread_id': msg['thread_id']
                 }
                 
                 # Clean up sender name (extract from email format if needed)
@@ -136,6 +243,7 @@ class MailTool:
         """Get sender's profile information."""
         try:
             profile = self.service.users().getProfile(userId='me').execute()
+            self._account = profile.get('emailAddress') or self._account
             
             # Get display name from email address if settings.get() is not available
             display_name = profile.get('emailAddress', '').split('@')[0].replace('.', ' ').title()
@@ -169,7 +277,7 @@ class MailTool:
             return "No readable content"
         except Exception as e:
             print(f"Error extracting email body: {str(e)}")
-            return "Error extracting content"
+            return EXTRACTION_ERROR
  
     def decode_base64(self, data):
         """Decode base64-encoded email body text."""
@@ -177,21 +285,16 @@ class MailTool:
     
     def _extract_email_parts(self, msg_data):
         """Extract relevant parts from email data."""
-        headers = msg_data["payload"]["headers"]
-        subject = next((h["value"] for h in headers if h["name"] == "Subject"), "No Subject")
-        sender = next((h["value"] for h in headers if h["name"] == "From"), "Unknown Sender")
-        date = next((h["value"] for h in headers if h["name"] == "Date"), "")
-
-        # Extract body
-        body = self._get_email_body(msg_data["payload"])
+        return self._email_from_parsed(self._parse_message(msg_data))
 
+    def _email_from_parsed(self, parsed):
         return {
-            "id": msg_data["id"],
-            "thread_id": msg_data["threadId"],
-            "subject": subject,
-            "sender": sender,
-            "date": date,
-            "body": body
+            "id": parsed["id"],
+            "thread_id": parsed["thread_id"],
+            "subject": self._header(parsed, "Subject", "No Subject"),
+            "sender": self._header(parsed, "From", "Unknown Sender"),
+            "date": self._header(parsed, "Date"),
+            "body": parsed["body"]
         }
     
     def mark_as_read(self, email_ids):
@@ -206,6 +309,9 @@ class MailTool:
                     id=email_id,
                     body={"removeLabelIds": ["UNREAD"]}
                 ).execute()
+                # Labels are cached apart from the content, so this leaves the cached message valid
+                if self.message_cache is not None and self._account:
+                    self.message_cache.update_labels(self._account, email_id, remove=["UNREAD"])
             return True
         except Exception as e:
             print(f"Error marking emails as read: {e}")
@@ -229,14 +335,8 @@ class MailTool:
             messages = results.get('messages', [])
             emails = []
 
-            for message in messages:
-                email_data = self.service.users().messages().get(
-                    userId='me',
-                    id=message['id'],
-                    format='full'
-                ).execute()
-                
-                email = self._extract_email_parts(email_data)
+            for parsed in self._get_parsed_messages([message['id'] for message in messages], format='full'):
+                email = self._email_from_parsed(parsed)
                 emails.append(email)
 
             return emails
@@ -257,14 +357,8 @@ class MailTool:
             messages = results.get('messages', [])
             emails = []
 
-            for message in messages:
-                email_data = self.service.users().messages().get(
-                    userId='me',
-                    id=message['id'],
-                    format='full'
-                ).execute()
-                
-                email = self._extract_email_parts(email_data)
+            for parsed in self._get_parsed_messages([message['id'] for message in messages], format='full'):
+                email = self._email_from_parsed(parsed)
                 emails.append(email)
 
             return emails
@@ -276,17 +370,16 @@ class MailTool:
     def reply_to_email(self, message_id: str, to: str, body: str) -> bool:
         """Reply to an existing email."""
         try:
-            # Get the original message to extract thread ID and subject
-            original = self.service.users().messages().get(
-                userId="me",
-                id=message_id,
-                format="metadata",
-                metadataHeaders=["Subject", "References", "Message-ID"]
-            ).execute()
+            # Get the original message to extract thread ID and subject (from the message cache when it was read before)
+            parsed = self._get_parsed_messages(
+                [message_id], format="metadata", metadata_headers=["Subject", "References", "Message-ID"]
+            )
+            if not parsed:
+                raise ValueError(f"Message {message_id} not found")
+            original = parsed[0]
 
             # Get the subject
-            headers = original["payload"]["headers"]
-            subject = next((h["value"] for h in headers if h["name"] == "Subject"), "")
+            subject = self._header(original, "Subject")
             if not subject.startswith("Re:"):
                 subject = f"Re: {subject}"
 
@@ -297,7 +390,7 @@ class MailTool:
             
             # Add threading headers
             message["In-Reply-To"] = message_id
-            references = next((h["value"] for h in headers if h["name"] == "References"), "")
+            references = self._header(original, "References")
             if references:
                 message["References"] = f"{references} {message_id}"
             else:
@@ -309,7 +402,7 @@ class MailTool:
                 userId="me",
                 body={
                     "raw": raw_message,
-                    "threadId": original["threadId"]
+                    "threadId": original["thread_id"]
                 }
             ).execute()
 
@@ -322,18 +415,15 @@ class MailTool:
     def get_thread(self, thread_id: str) -> List[Dict]:
         """Get all messages in a thread."""
         try:
+            # Only the message ids; their content comes from the message cache or one batch fetch
             thread = self.service.users().threads().get(
                 userId='me',
                 id=thread_id,
-                format='full'
+                format='minimal'
             ).execute()
 
-            emails = []
-            for message in thread['messages']:
-                email = self._extract_email_parts(message)
-                emails.append(email)
-
-            return emails
+            message_ids = [message['id'] for message in thread['messages']]
+            return [self._email_from_parsed(parsed) for parsed in self._get_parsed_messages(message_ids, format='full')]
 
         except Exception as e:
             print(f"Error fetching thread: {e}")
@@ -369,19 +459,12 @@ class MailTool:
             messages = results.get("messages", [])
             email_addresses = set()
 
-            for msg in messages:
-                email_data = self.service.users().messages().get(
-                    userId="me",
-                    id=msg["id"],
-                    format="metadata",
-                    metadataHeaders=["From", "To"]
-                ).execute()
-
-                headers = email_data["payload"]["headers"]
-                
-                for header in headers:
-                    if header["name"] in ["From", "To"]:
-                        addresses = self._extract_email_addresses(header["value"])
+            for email_data in self._get_parsed_messages(
+                [msg["id"] for msg in messages], format="metadata", metadata_headers=["From", "To"]
+            ):
+                for header, value in email_data["headers"]:
+                    if header in ["From", "To"]:
+                        addresses = self._extract_email_addresses(value)
                         for name, email in addresses:
                             if name_query.lower() in name.lower():
                                 email_addresses.add((name, email))
@@ -8,6 +8,27 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class CalendarAgent:
+    # Function definition the Director offers the LLM when it routes with tool calling
+    TOOL_SCHEMA = {
+        "type": "function",
+        "function": {
+            "name": "calendar",
+            "description": "Create, update, delete, check or list events in the user's Google Calendar. Resolve relative dates against today's date.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "action": {"type": "string", "enum": ["create", "update", "delete", "check", "extract"]},
+                    "event_name": {"type": "string"},
+                    "start_time": {"type": "string", "description": "ISO 8601 start, e.g. 2025-05-02T15:00:00"},
+                    "end_time": {"type": "string", "description": "ISO 8601 end; one hour after start_time if not given"},
+                    "potential_start": {"type": "string", "description": "Start of the window to search when the event is not fully specified (update, delete)"},
+                    "potential_end": {"type": "string", "description": "End of that search window"}
+                },
+                "required": ["action"]
+            }
+        }
+    }
+
     # 1. CRITICAL: Accept credentials object
     def __init__(self, credentials: Credentials):
         # Store credentials (if needed)
@@ -76,6 +97,11 @@ class CalendarAgent:
         response = self.handle_action(task)
         return response
 
+    def handle_tool_call(self, arguments):
+        """Executes a calendar action whose fields were already extracted by the Director's tool-calling request."""
+        print("Task:", arguments)
+        return self.handle_action(arguments)
+
     def normal_query(self, continual_query):
         response = self.client.chat.completions.create(
             model="gpt-4o-mini",
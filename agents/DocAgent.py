@@ -13,6 +13,27 @@ class DocAgent:
     # and potential use in error messages.
     REQUIRED_SCOPE = "https://www.googleapis.com/auth/documents"
 
+    # Function definition the Director offers the LLM when it routes with tool calling
+    TOOL_SCHEMA = {
+        "type": "function",
+        "function": {
+            "name": "doc",
+            "description": "Create, retrieve, add text to, update, delete or summarize the user's Google Docs.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "action": {"type": "string", "enum": ["create", "retrieve", "add_text", "update", "delete", "summarize"]},
+                    "file_name": {"type": "string", "description": "Document name; 'New File' for create if not mentioned"},
+                    "initial_content": {"type": "string", "description": "Optional content for a new document (create)"},
+                    "content": {"type": "string", "description": "Text to add (add_text)"},
+                    "new_text": {"type": "string", "description": "Replacement text (update)"},
+                    "location": {"type": "string", "enum": ["start", "end"], "description": "Where to add the text (add_text)"}
+                },
+                "required": ["action"]
+            }
+        }
+    }
+
     # 1. CRITICAL: Accept credentials object
     def __init__(self, credentials: Credentials):        
         self.credentials = credentials # Store locally
@@ -99,6 +120,11 @@ Except if a file name is not found leave the file_name field empty.
         response = self.handle_action(task)
         return response
 
+    def handle_tool_call(self, arguments):
+        """Executes a Docs action whose fields were already extracted by the Director's tool-calling request."""
+        print("Task:", arguments)
+        return self.handle_action(arguments)
+
     def get_doc_name(self, file):
         """Try to resolve an ambiguous or partial file name."""
         ten_docs = self.DocTool.get_recent_google_docs()
@@ -11,6 +11,34 @@ import logging
 load_dotenv()
 
 class EmailAgent:
+    # Function definition the Director offers the LLM when it routes with tool calling
+    TOOL_SCHEMA = {
+        "type": "function",
+        "function": {
+            "name": "email",
+            "description": "Send, reply to, forward, read, delete or search the user's Gmail emails.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "action": {"type": "string", "enum": ["send", "reply", "forward", "read", "delete", "search"]},
+                    "params": {
+                        "type": "object",
+                        "properties": {
+                            "to": {"type": "string", "description": "Recipient name or email address (send, forward)"},
+                            "subject": {"type": "string", "description": "Subject line (send, search, delete)"},
+                            "body": {"type": "string", "description": "Full message content, if the user gave one"},
+                            "message_id": {"type": "string", "description": "Gmail message ID (reply, forward, delete)"},
+                            "sender": {"type": "string", "description": "Sender's name or email (read, search, reply)"},
+                            "query": {"type": "string", "description": "Short summary of what the message should say"},
+                            "date_range": {"type": "string", "description": "Time filter like 'last week' or 'today'"}
+                        }
+                    }
+                },
+                "required": ["action", "params"]
+            }
+        }
+    }
+
     def __init__(self, credentials: Credentials): 
         """Initialize EmailAgent with its own MailTool instance, using credentials."""
         
@@ -150,6 +178,13 @@ class EmailAgent:
         # 2. Execute the action
         response = self.handle_action(action, params)
         return response
+
+    def handle_tool_call(self, arguments) -> str:
+        """Executes an action whose arguments were already extracted by the Director's tool-calling request."""
+        action = arguments.get("action")
+        params = arguments.get("params") or {}
+        logging.info(f"EmailAgent executing action: {action} with params: {params}")
+        return self.handle_action(action, params)
     
     def handle_action(self, action, params):
         if action == "read":
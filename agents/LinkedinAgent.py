@@ -1,5 +1,6 @@
 import os
 import json
+import asyncio
 from openai import OpenAI
 from dotenv import load_dotenv
 from Tools.LinkedinTool import LinkedInTool # NEW Import
@@ -15,6 +16,25 @@ import re
 load_dotenv()
 
 class LinkedinAgent:
+    # Function definition the Director offers the LLM when it routes with tool calling
+    TOOL_SCHEMA = {
+        "type": "function",
+        "function": {
+            "name": "linkedin",
+            "description": "Generate, post or schedule LinkedIn posts for the user.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "action": {"type": "string", "enum": ["generate", "post", "generate_and_post", "generate_and_schedule", "schedule"]},
+                    "topic": {"type": "string", "description": "What to write about (generate actions)"},
+                    "content": {"type": "string", "description": "Exact post text (post, schedule)"},
+                    "time": {"type": "string", "description": "Posting time in HH:MM 24-hour format (schedule actions)"}
+                },
+                "required": ["action"]
+            }
+        }
+    }
+
     # 1. CRITICAL: Standardized __init__ signature
     # We expect the Director to pass the LinkedIn token/ID in this 'credentials' dict
     def __init__(self, credentials: Dict[str, Any]): 
@@ -119,6 +139,16 @@ Only return a valid JSON object. Do not explain.
         if "error" in task:
             return f"Error analyzing request: {task['error']}"
 
+        return self.handle_action(task)
+
+    def handle_tool_call(self, arguments):
+        """Executes a LinkedIn action whose fields were already extracted by the Director's tool-calling request."""
+        if not self.available:
+            return "❌ LinkedIn service is unavailable due to missing credentials."
+        return self.handle_action(arguments)
+
+    def handle_action(self, task):
+        """Executes a parsed LinkedIn action."""
         action = task.get("action")
         topic = task.get("topic")
         post_content = task.get("content")
@@ -164,14 +194,43 @@ Only return a valid JSON object. Do not explain.
     def post_to_linkedin(self, content):
         """Post content directly to LinkedIn using the Tool."""
         return self.linkedin_tool.post_content(content)
-        
-    # 5. Handle Query and Action (This logic is mostly fine, but should check availability)
-    def handle_query(self, user_query):
+
+    # -------------------- Async variants --------------------
+
+    async def ahandle_query(self, user_query):
+        """Async variant of handle_query: the query is parsed on a worker thread, posting is awaited."""
         if not self.available:
             return "❌ LinkedIn service is unavailable due to missing credentials."
-            
-        # ... (Rest of handle_query logic remains the same, but remove the old
-        # post_to_linkedin helper functions and API calls)
-        
-        # NOTE: The scheduling logic in schedule_post is tightly coupled to the main script.
-        # This is generally problematic in an interactive assistant, but for now, we leave it.
\ No newline at end of file
+        task = await asyncio.to_thread(self._analyze_query_to_json, user_query)
+        if "error" in task:
+            return f"Error analyzing request: {task['error']}"
+        return await self.ahandle_action(task)
+
+    async def ahandle_tool_call(self, arguments):
+        """Async variant of handle_tool_call."""
+        if not self.available:
+            return "❌ LinkedIn service is unavailable due to missing credentials."
+        return await self.ahandle_action(arguments)
+
+    async def ahandle_action(self, task):
+        """
+        Async variant of handle_action: posts go through the pooled async HTTP client; generating
+        and scheduling stay blocking and run on a worker thread.
+        """
+        action = task.get("action")
+        if action == "post":
+            return await self.apost_to_linkedin(task.get("content"))
+        if action == "generate_and_post":
+            generated = await asyncio.to_thread(self.generate_post_content, task.get("topic"))
+            return await self.apost_to_linkedin(generated)
+        return await asyncio.to_thread(self.handle_action, task)
+
+    async def apost_to_linkedin(self, content):
+        """Async variant of post_to_linkedin."""
+        return await self.linkedin_tool.apost_content(content)
+
+    async def aclose(self):
+        # linkedin_tool is missing when __init__ failed before the availability check
+        linkedin_tool = getattr(self, "linkedin_tool", None)
+        if linkedin_tool is not None:
+            await linkedin_tool.aclose()
@@ -1,5 +1,6 @@
 import os
-from openai import OpenAI
+import json
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
 from Tools.WeatherTool import WeatherTool
 from typing import Dict, Any
@@ -7,12 +8,30 @@ from google.oauth2.credentials import Credentials
 
 
 class WeatherAgent:
+    # Function definition the Director offers the LLM when it routes with tool calling
+    TOOL_SCHEMA = {
+        "type": "function",
+        "function": {
+            "name": "weather",
+            "description": "Current weather and forecast for the user's location or a named place.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "location_type": {"type": "string", "enum": ["current", "specific"]},
+                    "location_name": {"type": "string", "description": "City/area exactly as mentioned; omit for the current location"}
+                },
+                "required": ["location_type"]
+            }
+        }
+    }
+
     # 1. CRITICAL: Add the standardized credentials argument
     def __init__(self, credentials: Credentials = None):
         # We ignore the credentials, as the agent doesn't need them.
         # But accepting them ensures Director.py doesn't crash on initialization.
         
         self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.weather_tool = WeatherTool()
 
         # system prompt
@@ -24,9 +43,8 @@ class WeatherAgent:
             Present the information in a way that is conversational and engaging.
             """
 
-    def check_location(self, user_query: str):
-        """Analyze user query to determine location intent using a structured LLM response."""
-        messages = [
+    def _location_messages(self, user_query: str):
+        return [
             {
                 "role": "system",
                 "content": """
@@ -47,14 +65,10 @@ class WeatherAgent:
             {"role": "user", "content": user_query},
         ]
 
-        completion = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages
-        )
-
+    def _parse_location(self, content: str):
         try:
             # Clean and load JSON
-            content = completion.choices[0].message.content.strip()
+            content = content.strip()
             if content.startswith("```"):
                 content = content.strip("```json").strip("```").strip()
             
@@ -68,15 +82,30 @@ class WeatherAgent:
             # Fallback to current location on parsing error
             return {"current_location": True, "location": None}
 
-    def format_weather_response(self, weather_data, location_data):
-        """Generate a natural language response from weather data using GPT."""
+    def check_location(self, user_query: str):
+        """Analyze user query to determine location intent using a structured LLM response."""
+        completion = self.client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=self._location_messages(user_query)
+        )
+        return self._parse_location(completion.choices[0].message.content)
+
+    async def acheck_location(self, user_query: str):
+        """Async variant of check_location."""
+        completion = await self.async_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=self._location_messages(user_query)
+        )
+        return self._parse_location(completion.choices[0].message.content)
+
+    def _format_messages(self, weather_data, location_data):
         location_context = "your location" if location_data[
             "current_location"] else location_data["location"]
 
         # Add local time to the context
         local_time = weather_data.get("local_time", "")
         
-        messages = [
+        return [
             {"role": "system", "content": self.system_prompt},
             {
                 "role": "user",
@@ -84,13 +113,30 @@ class WeatherAgent:
             }
         ]
 
+    def format_weather_response(self, weather_data, location_data):
+        """Generate a natural language response from weather data using GPT."""
         completion = self.client.chat.completions.create(
             model="gpt-4o-mini",
-            messages=messages
+            messages=self._format_messages(weather_data, location_data)
         )
 
         return completion.choices[0].message.content
 
+    async def aformat_weather_response(self, weather_data, location_data):
+        """Async variant of format_weather_response."""
+        return "".join([chunk async for chunk in self.astream_weather_response(weather_data, location_data)])
+
+    async def astream_weather_response(self, weather_data, location_data):
+        """Streams the weather summary chunk by chunk."""
+        stream = await self.async_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=self._format_messages(weather_data, location_data),
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
     def handle_query(self, user_query: str):
         """Handles user request by fetching and returning weather information."""
         try:
@@ -123,4 +169,58 @@ class WeatherAgent:
             return f"WingMan: {response}"
 
         except Exception as e:
-            return f"WingMan: System error: {str(e)}"
\ No newline at end of file
+            return f"WingMan: System error: {str(e)}"
+
+    async def ahandle_query(self, user_query: str):
+        """Async variant of handle_query: LLM and Open-Meteo calls are awaited, geocoding runs on a worker thread."""
+        return "".join([chunk async for chunk in self.astream_query(user_query)])
+
+    async def astream_query(self, user_query: str):
+        """Fetches the weather, then streams the summary as the model writes it."""
+        try:
+            location_data = await self.acheck_location(user_query)
+        except Exception as e:
+            yield f"WingMan: System error: {str(e)}"
+            return
+        async for chunk in self._astream_weather(location_data):
+            yield chunk
+
+    async def ahandle_tool_call(self, arguments):
+        return "".join([chunk async for chunk in self.astream_tool_call(arguments)])
+
+    async def astream_tool_call(self, arguments):
+        """Same as astream_query, with the location already extracted by the Director's tool-calling request."""
+        location_data = {
+            "current_location": (arguments.get("location_type") or "current").lower() == "current",
+            "location": arguments.get("location_name")
+        }
+        async for chunk in self._astream_weather(location_data):
+            yield chunk
+
+    async def _astream_weather(self, location_data):
+        try:
+            location_coordinates = await self.weather_tool.afigure_out_location(location_data)
+
+            if not location_coordinates:
+                yield "WingMan: I couldn't pinpoint that location. Could you please specify the city name more clearly?"
+                return
+
+            weather_data = await self.weather_tool.aget_weather(
+                latitude=location_coordinates["latitude"],
+                longitude=location_coordinates["longitude"]
+            )
+
+            if "error" in weather_data:
+                yield f"WingMan: Oops! Ran into a snag: {weather_data['error']}"
+                return
+
+            yield "WingMan: "
+            async for chunk in self.astream_weather_response(weather_data, location_data):
+                yield chunk
+
+        except Exception as e:
+            yield f"WingMan: System error: {str(e)}"
+
+    async def aclose(self):
+        await self.weather_tool.aclose()
+        await self.async_client.close()
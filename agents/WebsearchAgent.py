@@ -1,5 +1,5 @@
 import os
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
 from Tools.WebsearchTool import WebSearchTool
 from typing import Dict, Any
@@ -9,9 +9,26 @@ from google.oauth2.credentials import Credentials
 load_dotenv()
 
 class WebsearchAgent:
+    # Function definition the Director offers the LLM when it routes with tool calling
+    TOOL_SCHEMA = {
+        "type": "function",
+        "function": {
+            "name": "websearch",
+            "description": "Search the internet for current events, facts, or information not in the conversation.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Self-contained search query"}
+                },
+                "required": ["query"]
+            }
+        }
+    }
+
     # Accept the credentials argument
     def __init__(self, credentials: Credentials = None): 
         self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.search_tool = WebSearchTool()
         self.system_prompt = """
         You are WingMan's Web Search Agent, designed to find and present information from the internet.
@@ -45,12 +62,8 @@ class WebsearchAgent:
         except Exception as e:
             return f"Oops! Something went wrong with the search: {str(e)}"
 
-    def _format_quick_answer(self, result: Dict, query: str) -> str:
-        """Format quick answer results using GPT."""
-        if result.get("error"):
-            return f"Sorry, I couldn't find a quick answer for that. {result['error']}"
-            
-        messages = [
+    def _quick_answer_messages(self, result: Dict, query: str):
+        return [
             {"role": "system", "content": self.system_prompt},
             {"role": "user", "content": f"""
             Format this search result into a natural, direct response:
@@ -65,27 +78,28 @@ class WebsearchAgent:
             4. Keep it conversational
             """}
         ]
+
+    def _format_quick_answer(self, result: Dict, query: str) -> str:
+        """Format quick answer results using GPT."""
+        if result.get("error"):
+            return f"Sorry, I couldn't find a quick answer for that. {result['error']}"
         
         completion = self.client.chat.completions.create(
             model="gpt-4o-mini",
-            messages=messages,
+            messages=self._quick_answer_messages(result, query),
             temperature=0.7
         )
         
         return completion.choices[0].message.content
 
-    def _format_detailed_results(self, result: Dict, query: str) -> str:
-        """Format detailed search results using GPT."""
-        if result.get("error"):
-            return f"Sorry, I couldn't complete the detailed search. {result['error']}"
-            
+    def _detailed_results_messages(self, result: Dict, query: str):
         # Prepare search results for formatting
         results_text = "\n".join([
             f"- {r.get('title', 'Untitled')}: {r.get('snippet', 'No snippet available')}"
             for r in result.get("results", [])[:3]
         ])
         
-        messages = [
+        return [
             {"role": "system", "content": self.system_prompt},
             {"role": "user", "content": f"""
             Create a comprehensive but concise summary from these search results:
@@ -94,11 +108,64 @@ class WebsearchAgent:
             {results_text}
             """}
         ]
+
+    def _format_detailed_results(self, result: Dict, query: str) -> str:
+        """Format detailed search results using GPT."""
+        if result.get("error"):
+            return f"Sorry, I couldn't complete the detailed search. {result['error']}"
         
         completion = self.client.chat.completions.create(
             model="gpt-4o-mini",
-            messages=messages,
+            messages=self._detailed_results_messages(result, query),
             temperature=0.7
         )
         
-        return completion.choices[0].message.content
\ No newline at end of file
+        return completion.choices[0].message.content
+
+    # -------------------- Async variants --------------------
+
+    async def ahandle_query(self, user_query):
+        """Async variant of handle_query: Tavily and OpenAI calls are awaited on the caller's event loop."""
+        return "".join([chunk async for chunk in self.astream_query(user_query)])
+
+    async def astream_query(self, user_query):
+        """Searches, then streams the formatted answer chunk by chunk as the model produces it."""
+        try:
+            result = await self.search_tool.aget_quick_answer(user_query)
+            if result.get("answer"):
+                messages = self._quick_answer_messages(result, user_query)
+            else:
+                # If quick answer fails, try detailed search
+                result = await self.search_tool.aget_detailed_search(user_query)
+                if result.get("error"):
+                    yield f"Sorry, I couldn't complete the detailed search. {result['error']}"
+                    return
+                messages = self._detailed_results_messages(result, user_query)
+
+            async for chunk in self._astream_format(messages):
+                yield chunk
+
+        except Exception as e:
+            yield f"Oops! Something went wrong with the search: {str(e)}"
+
+    async def ahandle_tool_call(self, arguments):
+        return await self.ahandle_query(arguments.get("query", ""))
+
+    async def astream_tool_call(self, arguments):
+        async for chunk in self.astream_query(arguments.get("query", "")):
+            yield chunk
+
+    async def _astream_format(self, messages):
+        stream = await self.async_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0.7,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def aclose(self):
+        await self.search_tool.aclose()
+        await self.async_client.close()
@@ -0,0 +1,116 @@
+# agents/registry.py
+import logging
+import threading
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional
+
+
+class LazyAgentRegistry(Mapping):
+    """
+    Dict-like container of agents that are registered as factories and built on first access.
+
+    Membership, iteration and len() only look at the registered factories, so the Director can
+    build its prompt and report availability without constructing (or importing) any agent.
+    Indexing or .get() materializes the agent once; concurrent callers wait for the same build.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self.build_times: Dict[str, float] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+
+    def __getitem__(self, name: str):
+        if name in self._instances:
+            return self._instances[name]
+        if name not in self._factories:
+            raise KeyError(name)
+
+        with self._locks[name]:
+            # Another thread may have finished the build while we were waiting
+            if name not in self._instances:
+                started = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                self.build_times[name] = time.perf_counter() - started
+        return self._instances[name]
+
+    def __iter__(self):
+        return iter(self._factories)
+
+    def __len__(self):
+        return len(self._factories)
+
+    def __contains__(self, name):
+        return name in self._factories
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def loaded(self) -> Dict[str, Any]:
+        """Returns only the agents that have already been constructed."""
+        return dict(self._instances)
+
+    def build_all(self, parallel: bool = True, timeout: Optional[float] = None) -> Dict[str, str]:
+        """
+        Builds every registered agent and logs a per-agent timing breakdown.
+
+        In parallel mode each agent is built on its own worker thread and gets `timeout` seconds
+        from the start; an agent that misses its deadline is reported as "timeout" but keeps
+        building in the background and is stored in the registry once it finishes.
+        Returns a {name: "ok" | "error" | "timeout"} outcome map.
+        """
+        started = time.perf_counter()
+        names = [name for name in self._factories if name not in self._instances]
+        outcomes = {name: "ok" for name in self._factories if name in self._instances}
+
+        if not parallel:
+            for name in names:
+                try:
+                    self[name]
+                    outcomes[name] = "ok"
+                except Exception as e:
+                    logging.error(f"❌ Failed to initialize {name} agent: {e}")
+                    outcomes[name] = "error"
+        elif names:
+            executor = ThreadPoolExecutor(max_workers=len(names), thread_name_prefix="agent-init")
+            futures = {name: executor.submit(self.__getitem__, name) for name in names}
+            deadline = started + timeout if timeout is not None else None
+            for name, future in futures.items():
+                remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+                try:
+                    future.result(timeout=remaining)
+                    outcomes[name] = "ok"
+                except FutureTimeoutError:
+                    logging.warning(f"⏱ {name} agent did not initialize within {timeout}s; it will be ready when its build finishes.")
+                    outcomes[name] = "timeout"
+                except Exception as e:
+                    logging.error(f"❌ Failed to initialize {name} agent: {e}")
+                    outcomes[name] = "error"
+            # Never block on stragglers; their builds complete on the worker threads
+            executor.shutdown(wait=False)
+
+        total = time.perf_counter() - started
+        breakdown = ", ".join(
+            f"{name}={self.build_times[name]:.2f}s" if name in self.build_times else f"{name}={outcomes.get(name)}"
+            for name in self._factories
+        )
+        logging.info(f"Agent startup ({'parallel' if parallel else 'sequential'}) took {total:.2f}s: {breakdown}")
+        return outcomes
+
+    def warm_up(self, background: bool = True, parallel: bool = True, timeout: Optional[float] = None):
+        """Builds every registered agent, optionally on a daemon thread so callers are not blocked."""
+        if not background:
+            self.build_all(parallel=parallel, timeout=timeout)
+            return None
+        thread = threading.Thread(
+            target=self.build_all, kwargs={"parallel": parallel, "timeout": timeout},
+            name="agent-warm-up", daemon=True
+        )
+        thread.start()
+        return thread
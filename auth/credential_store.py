@@ -0,0 +1,154 @@
+# auth/credential_store.py
+import os
+import json
+import logging
+import sqlite3
+import threading
+
+DEFAULT_DB = "data/users.db"
+LEGACY_USERS = "data/users.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS credentials (
+    email TEXT NOT NULL,
+    service TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (email, service)
+);
+"""
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+class CredentialStore:
+    """
+    Per-user service credentials in one SQLite database (WAL mode), keyed by (email, service).
+
+    Lookups are primary-key reads and a save rewrites a single row inside a write transaction,
+    so worker processes refreshing different users (or the same one) never overwrite each
+    other's tokens. An existing data/users.json is imported once and renamed to
+    users.json.migrated.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB, legacy_path=LEGACY_USERS):
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # Autocommit mode; writes that need atomicity open their own transaction
+        self._conn = sqlite3.connect(db_path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Tokens are tiny and losing a refreshed one forces a re-login, so every commit is synced
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(SCHEMA)
+
+        if legacy_path and os.path.exists(legacy_path):
+            self._import_json(legacy_path)
+
+    @classmethod
+    def shared(cls, db_path=DEFAULT_DB):
+        """One store (and connection) per database file for the whole process."""
+        path = os.path.abspath(db_path)
+        with _shared_lock:
+            if path not in _shared:
+                _shared[path] = cls(db_path=db_path)
+            return _shared[path]
+
+    def _import_json(self, legacy_path):
+        """Copies the users of a legacy users.json into the database, once."""
+        try:
+            with open(legacy_path, "r") as f:
+                users = json.load(f)
+        except FileNotFoundError:
+            return  # Another process migrated it first
+        except json.JSONDecodeError:
+            logging.error(f"Error decoding {legacy_path}. File may be corrupted; not migrating it.")
+            return
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for user in users:
+                    for service, data in user.get("services", {}).items():
+                        # Rows written since (e.g. by another process) win over the old file
+                        self._conn.execute(
+                            "INSERT OR IGNORE INTO credentials (email, service, data) VALUES (?, ?, ?)",
+                            (user["email"], service, json.dumps(data))
+                        )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        try:
+            os.replace(legacy_path, legacy_path + ".migrated")
+        except FileNotFoundError:
+            pass
+        logging.info(f"✅ Migrated {len(users)} user(s) from {legacy_path} into {self.db_path}.")
+
+    def version(self):
+        """Changes whenever another connection (e.g. another process) commits to the database."""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def get_service(self, email, service):
+        """The stored data of one service for one user, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM credentials WHERE email = ? AND service = ?", (email, service)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_user(self, email):
+        """{"email": ..., "services": {service: data}} (the users.json shape), or None."""
+        with self._lock:
+            rows = self._conn.execute("SELECT service, data FROM credentials WHERE email = ?", (email,)).fetchall()
+        if not rows:
+            return None
+        return {"email": email, "services": {service: json.loads(data) for service, data in rows}}
+
+    def user_exists(self, email):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM credentials WHERE email = ? LIMIT 1", (email,)).fetchone() is not None
+
+    def list_users(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT email FROM credentials ORDER BY email")]
+
+    def save_service(self, email, service, data):
+        """Replaces one service's data for one user."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO credentials (email, service, data) VALUES (?, ?, ?) "
+                "ON CONFLICT (email, service) DO UPDATE SET data = excluded.data",
+                (email, service, json.dumps(data))
+            )
+
+    def update_service(self, email, service, fields):
+        """
+        Merges `fields` into one service's data in a single write transaction, so concurrent
+        updates of other fields are not lost. Returns the merged data.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT data FROM credentials WHERE email = ? AND service = ?", (email, service)
+                ).fetchone()
+                data = json.loads(row[0]) if row else {}
+                data.update(fields)
+                self._conn.execute(
+                    "INSERT INTO credentials (email, service, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT (email, service) DO UPDATE SET data = excluded.data",
+                    (email, service, json.dumps(data))
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return data
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
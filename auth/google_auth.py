@@ -1,14 +1,13 @@
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.oauth2.credentials import Credentials
-import json
 # Import the new saving function
 from auth.token_manager import save_credentials
+from config.config_loader import scopes as load_scopes
 
 def login_user(email, selected_apps):
     # Load scopes
     try:
-        with open("config/scopes.json") as f:
-            scopes_map = json.load(f)
+        scopes_map = load_scopes()
         scopes = [scopes_map[app] for app in selected_apps if app in scopes_map] 
     except FileNotFoundError:
         print("❌ Error: config/scopes.json not found. Cannot proceed with OAuth.")
@@ -1,18 +1,16 @@
 import os
 import requests
-import json
 import urllib.parse as urlparse
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service as ChromeService
 from webdriver_manager.chrome import ChromeDriverManager
 import time
 from typing import Dict, Any
+from config.config_loader import linkedin_client
 
 def _load_linkedin_secrets():
     try:
-        with open("config/client_secret.json", "r") as f:
-            secrets = json.load(f)["linkedin"]
-            return secrets
+        return linkedin_client()
     except Exception as e:
         raise FileNotFoundError(f"Cannot load LinkedIn secrets from client_secret.json: {e}")
 
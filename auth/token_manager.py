@@ -1,69 +1,109 @@
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-import json
-import os
-from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional
 import logging
+from auth.credential_store import CredentialStore
+from config.config_loader import config_file, google_client, CLIENT_SECRET_PATH
 
-def _load_all_users() -> List[Dict]:
-    """Loads the entire user list from users.json."""
-    if os.path.exists("data/users.json"):
-        try:
-            with open("data/users.json", "r") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            logging.error("Error decoding users.json. File may be corrupted.")
-            return []
-    return []
-
-def _save_all_users(users: List[Dict]):
-    """Saves the entire user list back to users.json."""
+# Refresh Google access tokens this long before they expire, so callers never get one that
+# dies mid-request
+REFRESH_MARGIN = timedelta(minutes=5)
+
+# Process-level cache of live Credentials objects: {email: ((store version, secrets version), creds)}.
+# Every Director/agent of a user shares the same object, so a refresh is seen by all of them.
+_credentials_cache: Dict[str, tuple] = {}
+_cache_lock = threading.Lock()
+
+# One lock per user so only one thread loads/refreshes a user's token at a time (single flight)
+_refresh_locks: Dict[str, threading.Lock] = {}
+
+def _files_stamp() -> tuple:
+    """Identifies the current version of the data credentials are built from."""
+    return (_store().version(), config_file(CLIENT_SECRET_PATH).version())
+
+def _parse_expiry(value: Optional[str]) -> Optional[datetime]:
+    """Credentials.expiry is a naive UTC datetime; stored expiries are ISO strings."""
+    if not value:
+        return None
     try:
-        with open("data/users.json", "w") as f:
-            json.dump(users, f, indent=2)
-    except Exception as e:
-        logging.error(f"Error saving users.json: {e}")
+        expiry = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if expiry.tzinfo is not None:
+        expiry = expiry.astimezone(timezone.utc).replace(tzinfo=None)
+    return expiry
+
+def _needs_refresh(creds: Credentials, margin: timedelta = REFRESH_MARGIN) -> bool:
+    if not creds.token:
+        return True
+    if creds.expiry is None:
+        return False
+    return creds.expiry - margin <= datetime.now(timezone.utc).replace(tzinfo=None)
+
+def invalidate_credentials(email: Optional[str] = None):
+    """Drops the cached Credentials of one user (or of everyone)."""
+    with _cache_lock:
+        if email is None:
+            _credentials_cache.clear()
+        else:
+            _credentials_cache.pop(email, None)
+
+def _store() -> CredentialStore:
+    """The process-wide user credential store (data/users.db)."""
+    return CredentialStore.shared()
 
 # --- Core Token Management ---
 
 def save_credentials(email: str, service: str, data: Dict[str, Any]):
     """Saves or updates a user's credentials for a specific service."""
-    
-    users = _load_all_users()
-    
-    # Find user or create new entry
-    user_found = False
-    for i, user in enumerate(users):
-        if user["email"] == email:
-            # Update existing user
-            if "services" not in user:
-                user["services"] = {}
-            user["services"][service] = data
-            users[i] = user
-            user_found = True
-            break
-    
-    if not user_found:
-        # Create new user entry
-        new_user = {
-            "email": email,
-            "services": {service: data}
-        }
-        users.append(new_user)
-    
-    _save_all_users(users)
+    _store().save_service(email, service, data)
+    invalidate_credentials(email)
     logging.info(f"✅ Credentials for service '{service}' saved/updated for {email}.")
 
 
-def load_google_credentials(email: str) -> Credentials:
+def load_google_credentials(email: str, refresh_margin: timedelta = REFRESH_MARGIN) -> Credentials:
     """
     Loads Google credentials, performs refresh if necessary, and returns a 
     google.oauth2.credentials.Credentials object.
+
+    Repeat calls return the cached object without re-reading anything, as long as the credential
+    store and client_secret.json are unchanged and the token is not within `refresh_margin` of expiry.
+
+    Refreshes are single-flight: concurrent callers for the same user wait for the one refresh in
+    progress and get its result, and a token another process already refreshed is adopted
+    instead of being refreshed again.
     """
-    users = _load_all_users()
-    
-    user = next((u for u in users if u["email"] == email), None)
+    creds = _cached_credentials(email, refresh_margin)
+    if creds:
+        return creds
+
+    with _cache_lock:
+        lock = _refresh_locks.setdefault(email, threading.Lock())
+    with lock:
+        # Whoever held the lock may have just refreshed it
+        creds = _cached_credentials(email, refresh_margin)
+        if creds:
+            return creds
+        return _load_google_credentials(email, refresh_margin)
+
+def _cached_credentials(email: str, refresh_margin: timedelta) -> Optional[Credentials]:
+    """The cached Credentials, if still current and not due for a refresh."""
+    stamp = _files_stamp()
+    with _cache_lock:
+        cached = _credentials_cache.get(email)
+    if cached and cached[0] == stamp and not _needs_refresh(cached[1], refresh_margin):
+        return cached[1]
+    return None
+
+def _load_google_credentials(email: str, refresh_margin: timedelta) -> Credentials:
+    # Taken before reading: data committed by others after this point changes the version again
+    stamp = _files_stamp()
+    with _cache_lock:
+        cached = _credentials_cache.get(email)
+
+    user = _store().get_user(email)
     if not user:
         raise ValueError(f"User {email} not found in user database.")
     
@@ -74,45 +114,50 @@ def load_google_credentials(email: str) -> Credentials:
 
     # 2. Load OAuth client details from client_secret.json (needed for refresh)
     try:
-        with open("config/client_secret.json", "r") as f:
-            full_secrets = json.load(f) # Load the file ONCE
-        
-        # CRITICAL FIX: Check for the required keys in the loaded object
-        client_data = full_secrets.get("installed") or full_secrets.get("web")
-
-        if not client_data:
-            raise KeyError("Google client secrets not found under 'installed' or 'web' key.")
-            
+        # Parsed once per process (re-parsed only if the file changes)
+        client_data = google_client()
     except FileNotFoundError:
         raise FileNotFoundError("config/client_secret.json not found, cannot refresh token.")
     except KeyError as e:
         raise KeyError(f"Client secret structure error during refresh: {e}") 
         
-    # 3. Create Credentials object
-    creds = Credentials(
-        token=google_data.get("access_token"),
-        refresh_token=google_data.get("refresh_token"),
-        token_uri=client_data["token_uri"],
-        client_id=client_data["client_id"],
-        client_secret=client_data["client_secret"],
-        scopes=google_data.get("scopes", [])
-    )
-
-    # 4. Refresh token if expired
-    if creds.expired and creds.refresh_token:
+    # 3. Create Credentials object, or keep the cached one (which agents may hold) for the same grant
+    stored_expiry = _parse_expiry(google_data.get("expiry"))
+    if cached and cached[0][1] == stamp[1] and cached[1].refresh_token == google_data["refresh_token"]:
+        creds = cached[1]
+        # Another process may have refreshed the token meanwhile: adopt it rather than refreshing again
+        if stored_expiry and (creds.expiry is None or stored_expiry > creds.expiry):
+            creds.token = google_data.get("access_token")
+            creds.expiry = stored_expiry
+    else:
+        creds = Credentials(
+            token=google_data.get("access_token"),
+            refresh_token=google_data.get("refresh_token"),
+            token_uri=client_data["token_uri"],
+            client_id=client_data["client_id"],
+            client_secret=client_data["client_secret"],
+            scopes=google_data.get("scopes", []),
+            expiry=stored_expiry
+        )
+
+    # 4. Refresh token if expired or about to expire
+    if _needs_refresh(creds, refresh_margin) and creds.refresh_token:
         try:
             creds.refresh(Request())
             
-            # 5. Save the refreshed token data back to users.json
-            google_data["access_token"] = creds.token
-            google_data["expiry"] = creds.expiry.isoformat()
-            
-            _save_all_users(users)
+            # 5. Save the refreshed token data back to the user's row (other fields untouched)
+            _store().update_service(email, "google", {
+                "access_token": creds.token,
+                "expiry": creds.expiry.isoformat()
+            })
             logging.info(f"🔄 Google token refreshed and saved for {email}.")
         except Exception as e:
             logging.error(f"❌ Failed to refresh Google token for {email}: {e}")
             raise RuntimeError("Failed to refresh Google credentials. Please re-run login.py.")
-    
+
+    # Our own commit does not change the store version, so the stamp taken before reading still holds
+    with _cache_lock:
+        _credentials_cache[email] = (stamp, creds)
     return creds
 
 def load_linkedin_tokens(email: str) -> Dict[str, Any]:
@@ -120,9 +165,7 @@ def load_linkedin_tokens(email: str) -> Dict[str, Any]:
     Loads LinkedIn token data, checks expiration if possible (optional), 
     and returns the raw dictionary.
     """
-    users = _load_all_users()
-    
-    user = next((u for u in users if u["email"] == email), None)
+    user = _store().get_user(email)
     if not user:
         raise ValueError(f"User {email} not found in user database.")
     
@@ -137,6 +180,10 @@ def load_linkedin_tokens(email: str) -> Dict[str, Any]:
     
     return linkedin_data
 
+def user_exists(email: str) -> bool:
+    """Checks whether a user has any saved credentials, without loading or refreshing them."""
+    return _store().user_exists(email)
+
 # --- Deprecated/Legacy Functions (for clean-up later) ---
 
 def load_user_credentials(email):
@@ -145,10 +192,5 @@ def load_user_credentials(email):
 
 def has_scope(user_email, required_scope):
     """Checks if a user has authorized a specific Google scope."""
-    users = _load_all_users()
-    user = next((u for u in users if u["email"] == user_email), None)
-    if not user:
-        return False
-        
-    google_data = user.get("services", {}).get("google", {})
+    google_data = _store().get_service(user_email, "google") or {}
     return required_scope in google_data.get("scopes", [])
\ No newline at end of file
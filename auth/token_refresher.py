@@ -0,0 +1,110 @@
+# auth/token_refresher.py
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from auth.token_manager import load_google_credentials, REFRESH_MARGIN
+
+
+class TokenRefresher:
+    """
+    Refreshes the Google access tokens of active users in the background, `margin` before they
+    expire, so no user request waits on (or fails into) a token refresh.
+
+    Refreshing goes through token_manager.load_google_credentials with the wider margin: the
+    cached Credentials object every agent holds is refreshed in place and the new token is
+    saved to the user database. The thread sleeps until the next token is due (at most
+    `check_interval` seconds), and wakes early when a user is tracked.
+    """
+
+    def __init__(self, margin=timedelta(minutes=10), check_interval=60, retry_interval=30):
+        # The margin must exceed token_manager's, or request-time loads would refresh first
+        self.margin = max(margin, REFRESH_MARGIN + timedelta(minutes=1))
+        self.check_interval = check_interval
+        self.retry_interval = retry_interval
+        self._tracked = {}  # {email: Credentials}
+        self._retry_at = {}  # {email: datetime of the next attempt after a failure}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"refreshes": 0, "failures": 0}
+
+    def track(self, email, credentials):
+        """Keeps `email`'s Google credentials fresh from now on."""
+        if credentials is None:
+            return
+        with self._lock:
+            self._tracked[email] = credentials
+        self._wake.set()
+
+    def untrack(self, email):
+        with self._lock:
+            self._tracked.pop(email, None)
+            self._retry_at.pop(email, None)
+
+    def __contains__(self, email):
+        return email in self._tracked
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self._thread
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="token-refresher", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    @staticmethod
+    def _now():
+        # Credentials.expiry is naive UTC
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def _due_at(self, email, credentials):
+        if email in self._retry_at:
+            return self._retry_at[email]
+        if credentials.expiry is None:
+            return None
+        return credentials.expiry - self.margin
+
+    def _run(self):
+        while not self._stop.is_set():
+            timeout = self.refresh_due()
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+    def refresh_due(self):
+        """Refreshes every tracked token that is due. Returns the seconds until the next one is."""
+        now = self._now()
+        with self._lock:
+            due = [
+                email for email, creds in self._tracked.items()
+                if self._due_at(email, creds) is not None and self._due_at(email, creds) <= now
+            ]
+
+        for email in due:
+            try:
+                credentials = load_google_credentials(email, refresh_margin=self.margin)
+            except Exception as e:
+                self.stats["failures"] += 1
+                logging.warning(f"❌ Background token refresh failed for {email}, retrying in {self.retry_interval}s: {e}")
+                with self._lock:
+                    if email in self._tracked:
+                        self._retry_at[email] = self._now() + timedelta(seconds=self.retry_interval)
+                continue
+            self.stats["refreshes"] += 1
+            logging.info(f"🔄 Refreshed Google token for {email} ahead of expiry.")
+            with self._lock:
+                self._retry_at.pop(email, None)
+                if email in self._tracked:
+                    # A changed credential store can hand back a new object; keep following the live one
+                    self._tracked[email] = credentials
+
+        now = self._now()
+        with self._lock:
+            upcoming = [self._due_at(email, creds) for email, creds in self._tracked.items()]
+        upcoming = [(at - now).total_seconds() for at in upcoming if at is not None]
+        return max(1.0, min(upcoming + [self.check_interval]))
@@ -0,0 +1,93 @@
+# config/config_loader.py
+import os
+import json
+import threading
+from types import MappingProxyType
+
+CLIENT_SECRET_PATH = "config/client_secret.json"
+SCOPES_PATH = "config/scopes.json"
+
+
+def _freeze(value):
+    """Read-only copy of parsed JSON: dicts become mappingproxies, lists become tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class ConfigFile:
+    """
+    A JSON config file parsed once per process and re-parsed only when its mtime (or size)
+    changes. load() hands out one shared immutable view, so callers cannot alter each other's
+    config, and a new view (a new object) only after the file changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._data = None
+
+    def version(self):
+        """(mtime, size) of the file on disk, or None when it does not exist."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load(self):
+        """The parsed file as an immutable mapping. Raises FileNotFoundError if it does not exist."""
+        stamp = self.version()
+        if stamp is None:
+            raise FileNotFoundError(f"{self.path} not found.")
+        with self._lock:
+            if stamp != self._stamp:
+                with open(self.path, "r") as f:
+                    self._data = _freeze(json.load(f))
+                self._stamp = stamp
+            return self._data
+
+
+_files = {}
+_files_lock = threading.Lock()
+
+
+def config_file(path):
+    """The process-wide ConfigFile for `path`."""
+    with _files_lock:
+        if path not in _files:
+            _files[path] = ConfigFile(path)
+        return _files[path]
+
+
+# -------------------- Sections --------------------
+
+def google_client():
+    """Google OAuth client ("installed" or "web" section of client_secret.json)."""
+    secrets = config_file(CLIENT_SECRET_PATH).load()
+    client = secrets.get("installed") or secrets.get("web")
+    if not client:
+        raise KeyError("Google client secrets not found under 'installed' or 'web' key.")
+    return client
+
+
+def linkedin_client():
+    """LinkedIn app credentials ("linkedin" section of client_secret.json)."""
+    return config_file(CLIENT_SECRET_PATH).load()["linkedin"]
+
+
+def tavily_api_key():
+    """The Tavily API key, or None when it is not configured."""
+    try:
+        secrets = config_file(CLIENT_SECRET_PATH).load()
+    except FileNotFoundError:
+        return None
+    return (secrets.get("tavily") or {}).get("api_key")
+
+
+def scopes():
+    """App name -> Google OAuth scope, from scopes.json."""
+    return config_file(SCOPES_PATH).load()
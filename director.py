@@ -1,28 +1,48 @@
 import os
 import json
 import logging
+import asyncio
+import threading
+import functools
+import importlib
+import importlib.util
 from auth.token_manager import load_google_credentials
 from auth.token_manager import load_linkedin_tokens
 from google.oauth2.credentials import Credentials
 from datetime import datetime
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
+from routing.intent_classifier import IntentClassifier, extract_examples, looks_multi_intent
+from routing.route_cache import RouteCache, context_fingerprint, looks_context_dependent, normalize_query
+from memory.context_assembler import select_within_budget, CONTEXT_TOKENS
 
 # ---- Agent Imports ----
-from agents.EmailAgent import EmailAgent
-from agents.CalendarAgent import CalendarAgent
-from agents.DocAgent import DocAgent
-# from agents.ResearchAgent import ResearchAgent
-from agents.WeatherAgent import WeatherAgent
-from agents.WebsearchAgent import WebsearchAgent
-
-from agents.LinkedinAgent import LinkedinAgent
-## from agents.SpotifyAgent import SpotifyAgent
-## from agents.YouTubeAgent import YouTubeAgent
+# Agent modules (and their Google/OpenAI clients) are imported lazily by the agent factories,
+# following the "agents/{Name}Agent.py" -> "{Name}Agent" naming convention.
+from agents.registry import LazyAgentRegistry
 
 # ---- Load environment ----
 load_dotenv()
 
+# ---- Sync bridge ----
+# The Director pipeline is async; the synchronous API (used by main.py) submits coroutines
+# to one shared event loop running on a daemon thread, so the AsyncOpenAI/httpx clients
+# always stay bound to the same loop across calls.
+_sync_loop = None
+_sync_loop_lock = threading.Lock()
+
+def _run_sync(coro):
+    """Runs a coroutine on the shared background loop and blocks until it finishes."""
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name="director-loop", daemon=True).start()
+    if threading.current_thread().name == "director-loop":
+        coro.close()
+        raise RuntimeError("Synchronous Director API called from inside its own event loop; await the async method instead.")
+    return asyncio.run_coroutine_threadsafe(coro, _sync_loop).result()
+
 class Director:
     # Map agents to the required Google API scope from config/scopes.json
     AGENT_SCOPE_MAP = {
@@ -33,101 +53,9 @@ class Director:
         # Add non-Google agents here too, e.g., "linkedin": "r_liteprofile"
     }
 
-    def __init__(self, user_email):
-        self.user_email = user_email
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.credentials: Credentials = None
-        self.agents = {}
-        self.conversation_history = []
-        self.last_used_agent = None
-        self.google_credentials = None
-        self.linkedin_tokens = None
-
-        try:
-            # Try loading Google credentials (refreshes if needed)
-            self.google_credentials = load_google_credentials(user_email)
-            self.user_scopes = set(self.google_credentials.scopes)
-        except ValueError:
-            self.user_scopes = set()
-            logging.info(f"Google services not available for {user_email}.")
-            
-        try:
-            # Try loading LinkedIn tokens (returns dict if available)
-            self.linkedin_tokens = load_linkedin_tokens(user_email)
-        except ValueError:
-            logging.info(f"LinkedIn service not available for {user_email}.")
-
-        # 2. Dynamically initialize agents based on granted scopes/available tokens
-        for agent_name, required_scope_list in self.AGENT_SCOPE_MAP.items():
-            agent_key = agent_name.lower()
-            agent_class_name = f"{agent_name}Agent"
-            AgentClass = globals().get(agent_class_name)
-
-            if AgentClass:
-                initialized = False
-                # A. Google Agents check scope and credentials
-                if agent_key in ["email", "calendar", "doc"]:
-                    if self.google_credentials and all(scope in self.user_scopes for scope in required_scope_list):
-                        self.agents[agent_key] = AgentClass(self.google_credentials)
-                        logging.info(f"✅ Initialized {agent_name}Agent (Google).")
-                        initialized = True
-                
-                # B. LinkedIn Agent check token dict availability
-                elif agent_key == "linkedin":
-                    # FIX: Renamed variable to avoid conflict with agent_name in previous scope
-                    linkedin_key = "linkedin" # Use "linkedin" for lookup in self.agents
-                    if self.linkedin_tokens:
-                        self.agents[linkedin_key] = AgentClass(self.linkedin_tokens) 
-                        logging.info(f"✅ Initialized LinkedInAgent.")
-                        initialized = True
-                
-                # C. Final Logging
-                if initialized:
-                    pass
-                else:
-                    # If AgentClass was found but not initialized (i.e., missing tokens/scopes)
-                    logging.info(f"❌ Skipping {agent_name}Agent: Scope/Token not granted.")
-            else:
-                logging.warning(f"Agent class {agent_class_name} not found.")
-
-            # 3. Initialize Public/Unscoped Agents (Unconditional)
-        try:
-            self.agents["weather"] = WeatherAgent(credentials=None)
-            logging.info("✅ Initialized WeatherAgent (Public).")
-        except ImportError:
-            logging.warning("WeatherAgent module not found.")
-
-        try:
-            self.agents["websearch"] = WebsearchAgent(credentials=None)
-            logging.info("✅ Initialized WebsearchAgent (Public).")
-        except ImportError:
-            logging.warning("WebsearchAgent module not found.")
-
-        # 4. Generate the dynamic system prompt
-        self.system_prompt = self._generate_dynamic_system_prompt()
-
-    def _generate_dynamic_system_prompt(self):
-        """Generates the system prompt using only the agents available to the user."""
-        
-        # Start with the static instructions
-        prompt = """You are WingMan's Director — an intelligent coordinator and assistant. You analyze user input and route it to the correct specialized agent.
-
-🧠 ALWAYS return a valid JSON **single dictionary** in the following format:
-{
-    "agent": "name_of_agent",
-    "query": "user's query meant for that agent"
-}
-
-Only include `agent` and `query` keys. DO NOT include actions, parameters, or any other fields.
-
----
-
-🟡 Use these agents:
-
-"""
-        # Dictionary mapping agent names to descriptions (needs to be defined centrally or loaded)
-        AGENT_DESCRIPTIONS = {
-            "email": """
+    # Dictionary mapping agent names to descriptions, shared by the routing prompt and the intent classifier
+    AGENT_DESCRIPTIONS = {
+        "email": """
 📧 **Email Agent** – for anything related to email:
 {
     "agent": "email",
@@ -139,7 +67,7 @@ Examples:
 - "Show me emails from Google"
 - "Reply to John's message with a thank you"
 """,
-            "calendar": """📅 **Calendar Agent** – for scheduling, editing, or checking events:
+        "calendar": """📅 **Calendar Agent** – for scheduling, editing, or checking events:
 {
     "agent": "calendar",
     "query": "calendar-related request like 'schedule a call at 3PM', 'delete my event tomorrow'"
@@ -149,7 +77,7 @@ Examples:
 - "Add a meeting with Dev at 10AM"
 - "Show my events for next week"
 """,
-            "doc": """📄 **Doc Agent** – for working with documents or notes:
+        "doc": """📄 **Doc Agent** – for working with documents or notes:
 {
     "agent": "doc",
     "query": "document or note related request like 'summarize this', 'search notes on finance'"
@@ -159,7 +87,7 @@ Examples:
 - "Summarize the report I uploaded"
 - "Find my notes on statistics"
 """,
-            "weather": """⛅ **Weather Agent** – for anything about the weather:
+        "weather": """⛅ **Weather Agent** – for anything about the weather:
 {
     "agent": "weather",
     "query": "weather-related request with location if mentioned"
@@ -169,9 +97,9 @@ Examples:
 - "What's the weather like in Mumbai?"
 - "Will it rain this weekend?"
 """,
-            "websearch": """🔍 **Web Search Agent** – for looking up anything online:
+        "websearch": """🔍 **Web Search Agent** – for looking up anything online:
 {
-    "agent": "web",
+    "agent": "websearch",
     "query": "search query or knowledge-based question"
 }
 
@@ -180,7 +108,7 @@ Examples:
 - "Latest news about cricket"
 - "How does a black hole form?"
 """,
-            "research": """📚 **Research Agent** – for help with academic references, research material, or study topics:
+        "research": """📚 **Research Agent** – for help with academic references, research material, or study topics:
 {
     "agent": "research",
     "query": "request for academic help like 'give me 10 papers on machine learning' or 'list resources on quantum computing'"
@@ -191,7 +119,7 @@ Examples:
 - "List references on fuzzy logic and its applications"
 - "Find textbooks on data structures with summaries and links"
 """,
-            "linkedin": """💼 **LinkedIn Agent** – for interacting with LinkedIn:
+        "linkedin": """💼 **LinkedIn Agent** – for interacting with LinkedIn:
 {
     "agent": "linkedin",
     "query": "LinkedIn-related actions like 'send a connection request', 'search for jobs', or 'message a recruiter', or 'schedule a post'"
@@ -202,7 +130,7 @@ Examples:
 - "Send a thank you message to Sarah on LinkedIn"
 - "Search for internships in data science"
 """,
-            "spotify": """🎵 **Spotify Agent** – for playing or managing music on Spotify:
+        "spotify": """🎵 **Spotify Agent** – for playing or managing music on Spotify:
 {
     "agent": "spotify",
     "query": "Spotify music-related requests like 'play a song', 'add to playlist', or 'recommend music'"
@@ -213,7 +141,7 @@ Examples:
 - "Add this song to my workout playlist"
 - "Recommend me some chill jazz"
 """,
-            "youtube": """📺 **YouTube Agent** – for searching and interacting with YouTube:
+        "youtube": """📺 **YouTube Agent** – for searching and interacting with YouTube:
 {
     "agent": "youtube",
     "query": "YouTube-related requests like 'search for a video', 'play something', or 'get video links'"
@@ -224,17 +152,9 @@ Examples:
 - "Play lo-fi music from YouTube"
 - "Find the latest video by MKBHD"
 """,    # Add descriptions for all potential agents here...
-        }
-
-        # Dynamically append available agents and their descriptions
-        for agent_name in self.agents.keys():
-            if agent_name in AGENT_DESCRIPTIONS:
-                # This needs to be expanded to include the JSON format and examples
-                # For brevity, we'll just add the header. You will need to fill out the full block.
-                prompt += f"{AGENT_DESCRIPTIONS[agent_name]}\n" 
+    }
 
-        # Always include the fallback self agent
-        prompt += """💬 **Self (General Conversation)** – for normal questions, jokes, or discussion:
+    SELF_DESCRIPTION = """💬 **Self (General Conversation)** – for normal questions, jokes, or discussion:
 {
     "agent": "self",
     "query": "the user query as-is"
@@ -243,39 +163,271 @@ Examples:
 Examples:
 - "What's your favorite movie?"
 - "Tell me a joke"
+"""
 
----
+    # Number of previous messages (content and answering agent) in the routing cache key of context-dependent queries
+    ROUTING_CONTEXT_DEPTH = 2
+
+    # Token budget for the conversation history sent along with a routing request; the same
+    # budget Session's ContextAssembler fills, so an assembled context is never cut again here
+    ROUTING_CONTEXT_TOKENS = CONTEXT_TOKENS
+
+    # Relevant messages from past conversations added to a routing request (when self.recall is set)
+    RECALL_LIMIT = 3
+
+    # Agents that need no user tokens and are always registered
+    PUBLIC_AGENTS = ["Weather", "Websearch"]
+
+    # Routing modes: "json" asks for {agent, query} and lets the agent parse the query itself,
+    # "tools" routes and extracts the agent's action arguments in one tool-calling request
+    ROUTING_MODES = ("json", "tools")
+
+    # System prompt for "tools" routing; static so it stays prompt-cacheable (the date goes in a separate message)
+    TOOLS_PROMPT = """You are WingMan — an intelligent assistant that coordinates specialized agents.
+
+For every request in the user's message that one of the available functions can handle, call that function
+with the arguments extracted from the message (use the conversation for missing details). If the message
+contains several independent requests, call one function per request.
+
+For normal questions, jokes, or discussion that no function covers, do not call any function:
+answer the user directly, helpfully and concisely.
+"""
+
+    # Startup modes: "lazy" builds agents on first use, "sequential" and "parallel" build them all in __init__
+    INIT_MODES = ("lazy", "sequential", "parallel")
+
+    # Static part of the routing prompt, identical for every user (see _build_system_prompt)
+    PROMPT_PREFIX = """You are WingMan's Director — an intelligent coordinator and assistant. You analyze user input and route it to the correct specialized agent.
+
+🧠 ALWAYS return a valid JSON **single dictionary** in the following format:
+{
+    "agent": "name_of_agent",
+    "query": "user's query meant for that agent"
+}
+
+Only include `agent` and `query` keys. DO NOT include actions, parameters, or any other fields.
 
 🧠 Additional rules:
-- Assume that the user provides only one request per message.
-- If the query contains multiple requests, return only the **first** or **most important** one.
-- Return only a single JSON dictionary, nothing else.
+- Most messages contain a single request: return a single JSON dictionary for them.
+- If the message contains several independent requests (e.g. "weather, my meetings today and unread emails"), return a JSON **list** with one dictionary per request, in the order they were asked, each with a self-contained query.
+- Return only the JSON dictionary or list, nothing else.
 - Be clear and concise in assigning agent responsibility.
+- Only route to the agents named in the "Available agents" line at the end; use "self" for everything else, including requests for an agent that is not available.
 - DO NOT add any explanation, metadata, or extra content.
 
+🧭 Choosing between agents:
+- Sending, reading, searching or replying to email goes to "email", even when the email is about a meeting; creating, moving, deleting or listing events goes to "calendar".
+- Messages, connection requests, posts and job searches on LinkedIn go to "linkedin", never to "email", unless the user explicitly asks for an email.
+- Creating, reading, summarizing or searching the user's own documents and notes goes to "doc"; looking up facts, news, prices, definitions or anything else on the internet goes to "websearch".
+- Current conditions, forecasts, rain, temperature and similar questions go to "weather", with the place exactly as the user wrote it (or no place if none is given).
+- Greetings, thanks, small talk, opinions, jokes and questions about yourself go to "self".
+- Follow-ups such as "reply to him", "what about tomorrow?" or "send it to Sarah too" depend on the conversation: resolve pronouns and omitted details from the previous turns so the query you return makes sense on its own, and route it to the agent that handled the related earlier request unless the user clearly changes topic.
+- Keep dates and times as the user said them ("tomorrow at 3", "next Friday"); the agent resolves them.
+- Never invent recipients, addresses, titles or content the user did not give or the conversation does not contain.
+
 ✅ Examples of valid output:
 
 { "agent": "calendar", "query": "schedule a team sync at 4 PM today" }
 
-{ "agent": "web", "query": "What is CRISPR gene editing?" }
+{ "agent": "websearch", "query": "What is CRISPR gene editing?" }
+
+{ "agent": "email", "query": "Reply to Priya's last email saying the slides are ready" }
+
+{ "agent": "doc", "query": "Create a document with my notes from today's standup" }
+
+{ "agent": "linkedin", "query": "Post an update that I started a new job at Acme" }
 
 { "agent": "self", "query": "Do you have a favorite book?" }
+
+[
+    { "agent": "weather", "query": "What's the weather today?" },
+    { "agent": "calendar", "query": "Show my events for today" }
+]
+
+[
+    { "agent": "email", "query": "Show my unread emails" },
+    { "agent": "websearch", "query": "Latest news about the stock market" }
+]
+
+---
+
+""" + SELF_DESCRIPTION + """
+---
+
+🟡 Agents (use only the ones available to this user, see the end):
+
 """
+
+    def __init__(self, user_email, intent_threshold=0.45, warm_up=False, init_mode="lazy", init_timeout=15, routing_mode="json"):
+        if init_mode not in self.INIT_MODES:
+            raise ValueError(f"Unknown init_mode '{init_mode}'. Expected one of {self.INIT_MODES}.")
+        if routing_mode not in self.ROUTING_MODES:
+            raise ValueError(f"Unknown routing_mode '{routing_mode}'. Expected one of {self.ROUTING_MODES}.")
+        self.routing_mode = routing_mode
+
+        self.user_email = user_email
+        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.credentials: Credentials = None
+        # Agents are registered as factories and only constructed when first routed to
+        self.agents = LazyAgentRegistry()
+        self.conversation_history = []
+        # Optional recall(query, k, exclude) -> relevant past messages, e.g. ChatMemory.recall
+        self.recall = None
+        self.last_used_agent = None
+        # How the last query was routed: "llm", "cache", "classifier" or "fallback" (routing failed)
+        self.last_routing_source = None
+        self.google_credentials = None
+        self.linkedin_tokens = None
+
+        try:
+            # Try loading Google credentials (refreshes if needed)
+            self.google_credentials = load_google_credentials(user_email)
+            self.user_scopes = set(self.google_credentials.scopes)
+        except ValueError:
+            self.user_scopes = set()
+            logging.info(f"Google services not available for {user_email}.")
+            
+        try:
+            # Try loading LinkedIn tokens (returns dict if available)
+            self.linkedin_tokens = load_linkedin_tokens(user_email)
+        except ValueError:
+            logging.info(f"LinkedIn service not available for {user_email}.")
+
+        # 2. Dynamically register agents based on granted scopes/available tokens
+        for agent_name, required_scope_list in self.AGENT_SCOPE_MAP.items():
+            agent_key = agent_name.lower()
+
+            if not self._agent_module_exists(agent_name):
+                logging.warning(f"Agent class {agent_name}Agent not found.")
+                continue
+
+            registered = False
+            # A. Google Agents check scope and credentials
+            if agent_key in ["email", "calendar", "doc"]:
+                if self.google_credentials and all(scope in self.user_scopes for scope in required_scope_list):
+                    self.agents.register(agent_key, self._agent_factory(agent_name, self.google_credentials))
+                    registered = True
+
+            # B. LinkedIn Agent check token dict availability
+            elif agent_key == "linkedin":
+                if self.linkedin_tokens:
+                    self.agents.register(agent_key, self._agent_factory(agent_name, self.linkedin_tokens))
+                    registered = True
+
+            # C. Final Logging
+            if not registered:
+                # The agent exists but is not available (i.e., missing tokens/scopes)
+                logging.info(f"❌ Skipping {agent_name}Agent: Scope/Token not granted.")
+
+        # 3. Register Public/Unscoped Agents (Unconditional)
+        for agent_name in self.PUBLIC_AGENTS:
+            if self._agent_module_exists(agent_name):
+                self.agents.register(agent_name.lower(), self._agent_factory(agent_name, None))
+            else:
+                logging.warning(f"{agent_name}Agent module not found.")
+
+        # 4. Generate the dynamic system prompt
+        self.system_prompt = self._generate_dynamic_system_prompt()
+
+        # 5. Local fast-path classifier, seeded from the examples of the available agents
+        self.intent_classifier = self._build_intent_classifier(intent_threshold)
+
+        # 6. Cache of LLM routing decisions, invalidated when self.agents changes
+        self.route_cache = RouteCache()
+        # Prompt-cache effectiveness of the routing calls, from the API usage fields
+        self.prompt_cache_stats = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+
+        # 7. Optionally build every agent up front (server mode) or in the background before the user needs it
+        if init_mode != "lazy":
+            self.agents.build_all(parallel=init_mode == "parallel", timeout=init_timeout)
+        elif warm_up:
+            self.agents.warm_up(background=True, timeout=init_timeout)
+
+    @staticmethod
+    def _agent_module_exists(agent_name):
+        """Checks that agents/{agent_name}Agent.py exists without importing it."""
+        return importlib.util.find_spec(f"agents.{agent_name}Agent") is not None
+
+    def _agent_factory(self, agent_name, credentials):
+        """Returns a callable that imports and constructs the agent on first use."""
+        def build():
+            module = importlib.import_module(f"agents.{agent_name}Agent")
+            AgentClass = getattr(module, f"{agent_name}Agent")
+            agent = AgentClass(credentials)
+            logging.info(f"✅ Initialized {agent_name}Agent.")
+            return agent
+        return build
+
+    def _generate_dynamic_system_prompt(self):
+        """Returns the system prompt for the agents available to the user (memoized per agent set)."""
+        return self._build_system_prompt(frozenset(self.agents.keys()))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _build_system_prompt(agent_names):
+        """
+        Assembles the routing prompt once per distinct agent set, process-wide.
+
+        Everything that does not depend on the user comes first as a byte-identical prefix so
+        OpenAI's automatic prompt caching can reuse it across users and turns. That includes the
+        descriptions of every agent this build can register, whether or not this user has it:
+        OpenAI only caches prefixes of at least 1024 tokens, which the instructions alone do not
+        reach. The one user-dependent line, the available agents in the fixed AGENT_DESCRIPTIONS
+        order, comes last.
+        """
+        known = {name.lower() for name in list(Director.AGENT_SCOPE_MAP) + Director.PUBLIC_AGENTS}
+        prompt = Director.PROMPT_PREFIX
+        for agent_name, description in Director.AGENT_DESCRIPTIONS.items():
+            if agent_name in known:
+                prompt += f"{description}\n"
+        available = [agent_name for agent_name in Director.AGENT_DESCRIPTIONS if agent_name in agent_names]
+        prompt += f"---\n\n🟢 Available agents: {', '.join(available + ['self'])}\n"
         return prompt
 
+    @staticmethod
+    def _agent_class(agent_key):
+        """Imports and returns the agent class registered under agent_key, without constructing it."""
+        names = {name.lower(): name for name in list(Director.AGENT_SCOPE_MAP) + Director.PUBLIC_AGENTS}
+        module = importlib.import_module(f"agents.{names[agent_key]}Agent")
+        return getattr(module, f"{names[agent_key]}Agent")
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _build_tools(agent_names):
+        """OpenAI tool definitions published by the available agents, memoized per agent set in a fixed order."""
+        tools = []
+        for agent_key in Director.AGENT_DESCRIPTIONS:
+            if agent_key not in agent_names:
+                continue
+            schema = getattr(Director._agent_class(agent_key), "TOOL_SCHEMA", None)
+            if schema:
+                # The function name is the routing key, whatever the agent module calls it
+                tools.append({"type": "function", "function": dict(schema["function"], name=agent_key)})
+        return tools
+
+    def _build_intent_classifier(self, threshold):
+        """Creates the local intent classifier from the example queries of the available agents."""
+        classifier = IntentClassifier(threshold=threshold)
+        for agent_name in self.agents.keys():
+            if agent_name in self.AGENT_DESCRIPTIONS:
+                for example in extract_examples(self.AGENT_DESCRIPTIONS[agent_name]):
+                    classifier.add_example(example, agent_name, pinned=True)
+        for example in extract_examples(self.SELF_DESCRIPTION):
+            classifier.add_example(example, "self", pinned=True)
+        return classifier
+
     # -------------------- Utility Functions --------------------
 
     def get_agent_status(self):
         """Returns a dictionary of all potential agents and their current availability."""
         status = {}
-        user_scopes = set(self.credentials.scopes) if self.credentials else set()
         
         # We need a comprehensive list of all potential agents and their display names
-        # Assuming AGENT_SCOPE_MAP contains ALL agents you ever plan to build
+        # Availability comes from the registered factories (i.e. scopes/tokens), so no agent is constructed here
         all_potential_agents = {
-            "Email": "Email",         # Must match AGENT_DESCRIPTIONS key
-            "Calendar": "Calendar", 
-            "Doc": "Doc",
+            "email": "Email",         # Must match AGENT_DESCRIPTIONS key
+            "calendar": "Calendar", 
+            "doc": "Doc",
             "research": "Research", 
             "weather": "Weather",
             "websearch": "Web Search", # Need to check the routing key for this one
@@ -308,12 +460,70 @@ Examples:
 
     # -------------------- Query Analysis --------------------
 
+    def _routing_context(self, user_query, contextual_history):
+        """
+        Fingerprint of the recent context that can change a routing decision. The cached result
+        carries the LLM's context-resolved query/arguments ("reply to him" -> a name), so for
+        queries that lean on the previous turns their content is part of the key. Self-contained
+        queries are keyed on the query alone, so they hit the cache whatever came before them.
+        """
+        recent = []
+        if looks_context_dependent(user_query):
+            recent = [
+                (message.get("role"), (message.get("metadata") or {}).get("agent"), normalize_query(message.get("content") or ""))
+                for message in contextual_history[-self.ROUTING_CONTEXT_DEPTH:]
+            ]
+        if self.routing_mode == "tools":
+            # Extracted arguments can hold resolved relative dates ("tomorrow"), so they are only valid for today
+            recent.append(datetime.now().strftime("%Y-%m-%d"))
+        return context_fingerprint(recent)
+
+    def _record_prompt_usage(self, usage):
+        """Accumulates prompt vs. cached prompt tokens reported by the API."""
+        if not usage:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.prompt_cache_stats["requests"] += 1
+        self.prompt_cache_stats["prompt_tokens"] += usage.prompt_tokens or 0
+        self.prompt_cache_stats["cached_tokens"] += (getattr(details, "cached_tokens", 0) or 0) if details else 0
+
+    @property
+    def cached_token_ratio(self):
+        """Share of routing prompt tokens served from OpenAI's prompt cache."""
+        prompt_tokens = self.prompt_cache_stats["prompt_tokens"]
+        return self.prompt_cache_stats["cached_tokens"] / prompt_tokens if prompt_tokens else 0.0
+
     def analyze_query(self, user_query):
+        """Synchronous wrapper around aanalyze_query."""
+        return _run_sync(self.aanalyze_query(user_query))
+
+    async def aanalyze_query(self, user_query):
         """Ask GPT to decide which agent should handle this query, using conversation history for context."""
+
+        # 0a. Reuse an earlier LLM decision for the same query in the same context
+        self.route_cache.validate_agents(self.agents.keys())
+        routing_context = self._routing_context(user_query, self.conversation_history[:-1])
+        cached = self.route_cache.get(user_query, routing_context)
+        if cached:
+            logging.info(f"Director routed query to: {', '.join(task['agent'] for task in self._to_tasks(cached))} (cached)")
+            self.last_routing_source = "cache"
+            return cached
+
+        # 0b. Fast path: answer confidently-classified queries locally without an LLM round trip.
+        # The classifier picks one agent, so messages that may hold several requests go to the LLM router.
+        prediction = None
+        if not looks_multi_intent(user_query):
+            prediction = self.intent_classifier.predict(user_query, allowed=list(self.agents.keys()) + ["self"])
+        if prediction:
+            agent_name, confidence = prediction
+            logging.info(f"Director routed query to: {agent_name} (local classifier, confidence {confidence:.2f})")
+            self.last_routing_source = "classifier"
+            return {"agent": agent_name, "query": user_query}
         
         # 1. Start with the System Prompt
+        system_prompt = self.TOOLS_PROMPT if self.routing_mode == "tools" else self.system_prompt
         messages = [
-            {"role": "system", "content": self.system_prompt}
+            {"role": "system", "content": system_prompt}
         ]
         
         # 2. Add Conversation History (Context)
@@ -328,46 +538,139 @@ Examples:
         
         contextual_history = self.conversation_history[:-1] # Exclude the current user query
         
-        # Add a maximum of the last 5 turns of conversation for context (adjust limit as needed)
-        context_limit = 5 
+        # Add as many of the latest turns as fit in the routing token budget
+        context_start = select_within_budget(contextual_history, self.ROUTING_CONTEXT_TOKENS)
         
-        for message in contextual_history[-context_limit:]:
+        for message in contextual_history[context_start:]:
             # Clean up the message structure for the LLM call:
             messages.append({
                 "role": message["role"],
                 "content": message["content"]
             })
             
+        # 2b. Add relevant messages from earlier conversations, after the history so it stays a cacheable prefix
+        recalled = await self._arecall(user_query, contextual_history[context_start:])
+        if recalled:
+            messages.append({"role": "system", "content": recalled})
+
         # 3. Add the current User Query
         messages.append({"role": "user", "content": user_query})
+
+        if self.routing_mode == "tools":
+            return await self._aroute_with_tools(user_query, messages, routing_context)
         
         # --- LLM Call ---
         try:
             logging.debug(f"Sending messages for analysis: {messages}") # Use logging.debug to see the full prompt structure
-            response = self.client.chat.completions.create(
+            completion = await self.client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=messages,
                 temperature=0
-            ).choices[0].message.content.strip()
+            )
+            self._record_prompt_usage(completion.usage)
+            response = completion.choices[0].message.content.strip()
 
             cleaned = self._clean_json_response(response)
             result = json.loads(cleaned)
-
-            if "agent" not in result or "query" not in result:
-                raise ValueError("Invalid structure returned.")
-
-            logging.info(f"Director routed query to: {result['agent']}")
+            tasks = self._to_tasks(result)
+
+            logging.info(f"Director routed query to: {', '.join(task['agent'] for task in tasks)}")
+            # Every single-agent LLM decision becomes a training example for the local classifier
+            if len(tasks) == 1 and tasks[0]["agent"] in self.intent_classifier.examples:
+                self.intent_classifier.add_example(user_query, tasks[0]["agent"])
+            self.route_cache.put(user_query, result, routing_context)
+            self.last_routing_source = "llm"
             return result
 
         except Exception as e:
             logging.error(f"Error analyzing query: {e}")
+            self.last_routing_source = "fallback"
+            return {"agent": "self", "query": user_query}
+
+    async def _arecall(self, user_query, context_messages):
+        """Formats the past messages most relevant to the query that are not already in the context."""
+        if not self.recall:
+            return None
+        try:
+            hits = await asyncio.to_thread(
+                self.recall, user_query, self.RECALL_LIMIT, {message["content"] for message in context_messages}
+            )
+        except Exception as e:
+            logging.warning(f"Memory recall failed: {e}")
+            return None
+        if not hits:
+            return None
+        lines = [f"- ({(hit.get('timestamp') or '')[:10]}, {hit['role']}) {hit['content']}" for hit in hits]
+        return "Possibly relevant messages from earlier conversations:\n" + "\n".join(lines)
+
+    async def _aroute_with_tools(self, user_query, messages, routing_context):
+        """
+        One tool-calling request that both picks the agent(s) and extracts their action arguments.
+        Returns tasks carrying "arguments" for agents, or a "self" task carrying the model's direct reply.
+        """
+        # Relative dates ("tomorrow at 3") need today's date; it goes after the cacheable system prompt
+        messages.insert(1, {"role": "system", "content": f"Today's date is {datetime.now().strftime('%Y-%m-%d (%A)')}."})
+        try:
+            tools = self._build_tools(frozenset(self.agents.keys()))
+            completion = await self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                tools=tools or None,
+                temperature=0
+            )
+            self._record_prompt_usage(completion.usage)
+            message = completion.choices[0].message
+
+            if not message.tool_calls:
+                logging.info("Director routed query to: self (tool routing)")
+                self.last_routing_source = "llm"
+                return [{"agent": "self", "query": user_query, "reply": (message.content or "").strip()}]
+
+            tasks = []
+            for tool_call in message.tool_calls:
+                agent_name = tool_call.function.name
+                arguments = json.loads(tool_call.function.arguments or "{}")
+                query = user_query
+                if len(message.tool_calls) > 1:
+                    # Each section of a fanned-out reply is headed by its own request, not the whole message
+                    values = [str(value) for value in arguments.values() if isinstance(value, (str, int, float))]
+                    query = f"{agent_name}: {', '.join(values)}" if values else agent_name
+                tasks.append({"agent": agent_name, "query": query, "arguments": arguments})
+
+            logging.info(f"Director routed query to: {', '.join(task['agent'] for task in tasks)} (tool routing)")
+            if len(tasks) == 1 and tasks[0]["agent"] in self.intent_classifier.examples:
+                self.intent_classifier.add_example(user_query, tasks[0]["agent"])
+            self.route_cache.put(user_query, tasks, routing_context)
+            self.last_routing_source = "llm"
+            return tasks
+
+        except Exception as e:
+            logging.error(f"Error analyzing query with tools: {e}")
+            self.last_routing_source = "fallback"
             return {"agent": "self", "query": user_query}
 
+    @staticmethod
+    def _to_tasks(analysis):
+        """Normalizes a routing result (single dict or list of dicts) into a list of {agent, query} tasks."""
+        tasks = analysis if isinstance(analysis, list) else [analysis]
+        if not tasks or not all(isinstance(task, dict) and "agent" in task and "query" in task for task in tasks):
+            raise ValueError("Invalid structure returned.")
+        return tasks
+
     # -------------------- Agent Handling --------------------
 
     def call_agent(self, agent_name, query):
-        """Routes the query to the correct agent."""
-        agent = self.agents.get(agent_name)
+        """Synchronous wrapper around acall_agent."""
+        return _run_sync(self.acall_agent(agent_name, query))
+
+    async def _resolve_agent(self, agent_name):
+        """Returns (agent, None) or (None, user-facing error message)."""
+        try:
+            # Builds the agent on first use (blocking Google/OpenAI client setup, so off the loop)
+            agent = await asyncio.to_thread(self.agents.get, agent_name)
+        except Exception as e:
+            logging.error(f"Error initializing {agent_name} agent: {e}")
+            return None, f"An error occurred while starting the {agent_name.capitalize()} Agent: {str(e)}"
         
         # 1. Check if the agent is initialized (should be true due to dynamic prompt)
         if not agent:
@@ -375,19 +678,77 @@ Examples:
             
             # 2. Check if the agent is defined in the full scope map (i.e., it exists but is disabled)
             if agent_name in self.AGENT_SCOPE_MAP:
-                return f"Sorry, you haven't enabled the **{agent_name.capitalize()} Agent** yet. To use this service, please run `login.py` again and grant access to the required scope."
+                return None, f"Sorry, you haven't enabled the **{agent_name.capitalize()} Agent** yet. To use this service, please run `login.py` again and grant access to the required scope."
             else:
-                return f"Sorry, I don’t have an agent named '{agent_name}'."
+                return None, f"Sorry, I don’t have an agent named '{agent_name}'."
+        return agent, None
+
+    async def acall_agent(self, agent_name, query, arguments=None):
+        """Routes the query (or, with tool routing, the already-extracted arguments) to the correct agent."""
+        agent, error = await self._resolve_agent(agent_name)
+        if error:
+            self.last_used_agent = None
+            return error
         
         try:
-            # ... (Rest of the call_agent function remains the same)
-            response = agent.handle_query(query)
+            # Agents with a native async path interleave on the loop; blocking agents run on a worker thread
+            if arguments is not None and hasattr(agent, "ahandle_tool_call"):
+                response = await agent.ahandle_tool_call(arguments)
+            elif arguments is not None and hasattr(agent, "handle_tool_call"):
+                response = await asyncio.to_thread(agent.handle_tool_call, arguments)
+            elif hasattr(agent, "ahandle_query"):
+                response = await agent.ahandle_query(query)
+            else:
+                response = await asyncio.to_thread(agent.handle_query, query)
             self.last_used_agent = agent_name
             return response
         except Exception as e:
             logging.error(f"Error in {agent_name} agent: {e}")
+            self.last_used_agent = None
             return f"An error occurred while using the {agent_name.capitalize()} Agent: {str(e)}"
 
+    async def astream_agent(self, agent_name, query, arguments=None):
+        """Yields the agent's response in chunks; agents without a streaming path yield their whole answer once."""
+        agent, error = await self._resolve_agent(agent_name)
+        if error:
+            self.last_used_agent = None
+            yield error
+            return
+
+        if arguments is not None:
+            stream = agent.astream_tool_call(arguments) if hasattr(agent, "astream_tool_call") else None
+        else:
+            stream = agent.astream_query(query) if hasattr(agent, "astream_query") else None
+
+        if stream is None:
+            yield self._response_text(await self.acall_agent(agent_name, query, arguments))
+            return
+
+        try:
+            async for chunk in stream:
+                yield chunk
+            self.last_used_agent = agent_name
+        except Exception as e:
+            logging.error(f"Error in {agent_name} agent: {e}")
+            self.last_used_agent = None
+            yield f"An error occurred while using the {agent_name.capitalize()} Agent: {str(e)}"
+
+    @staticmethod
+    def _response_text(response):
+        """
+        User-facing text of an agent response. Some tools answer with a dict (LinkedIn returns
+        {"status", "message"}): its message is shown, or the dict as readable JSON if it has none.
+        """
+        if isinstance(response, str):
+            return response
+        if isinstance(response, dict):
+            message = response.get("message") or response.get("error")
+            if isinstance(message, str):
+                return message
+        if isinstance(response, (dict, list)):
+            return json.dumps(response, indent=2, ensure_ascii=False, default=str)
+        return str(response or "")
+
     def structure_response(self, response_text):
         """Cleans and structures agent or model responses."""
         if not response_text:
@@ -396,27 +757,176 @@ Examples:
 
     # -------------------- Director Main Handler --------------------
 
+    async def _astream_chat_reply(self, query):
+        """Fallback GPT chat used for the "self" agent, streamed token by token."""
+        messages = [{"role": "user", "content": query}]
+        stream = await self.client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0.7,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def summarize_history(self, previous_summary, messages):
+        """Synchronous wrapper around asummarize_history (used as a ContextAssembler summarizer)."""
+        return _run_sync(self.asummarize_history(previous_summary, messages))
+
+    async def asummarize_history(self, previous_summary, messages):
+        """Folds messages that left the context window into the conversation's rolling summary."""
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        completion = await self.client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": (
+                    "You maintain a running summary of a conversation between a user and the WingMan assistant. "
+                    "Update the summary with the new messages. Keep names, email addresses, dates, decisions and "
+                    "open requests; drop small talk. Reply with the updated summary only, under 150 words."
+                )},
+                {"role": "user", "content": f"Current summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"}
+            ],
+            temperature=0
+        )
+        return completion.choices[0].message.content.strip()
+
+    async def _chat_reply(self, query):
+        return "".join([chunk async for chunk in self._astream_chat_reply(query)]).strip()
+
+    async def _run_task(self, task):
+        if task["agent"] == "self":
+            if "reply" in task:
+                return task["reply"]
+            return await self._chat_reply(task["query"])
+        return await self.acall_agent(task["agent"], task["query"], task.get("arguments"))
+
+    def run_tasks(self, tasks):
+        """Synchronous wrapper around arun_tasks."""
+        return _run_sync(self.arun_tasks(tasks))
+
+    async def arun_tasks(self, tasks):
+        """
+        Executes independent tasks concurrently across agents and returns the responses in task order.
+        Tasks for the same agent run sequentially since agents keep per-user state.
+        """
+        futures = [asyncio.get_running_loop().create_future() for _ in tasks]
+        await self._arun_tasks_into(tasks, futures)
+        return [future.result() for future in futures]
+
+    async def _arun_tasks_into(self, tasks, futures):
+        """Runs the tasks and resolves futures[i] with the response of tasks[i] as soon as it is ready."""
+        by_agent = {}
+        for index, task in enumerate(tasks):
+            by_agent.setdefault(task["agent"], []).append(index)
+
+        async def run_agent_tasks(indexes):
+            for index in indexes:
+                try:
+                    response = await self._run_task(tasks[index])
+                except Exception as e:
+                    logging.error(f"Error in {tasks[index]['agent']} task: {e}")
+                    response = f"An error occurred while handling '{tasks[index]['query']}': {str(e)}"
+                futures[index].set_result(response)
+
+        await asyncio.gather(*(run_agent_tasks(indexes) for indexes in by_agent.values()))
+
+    def _format_section(self, task, response):
+        """One section of a multi-request reply."""
+        return f"▶ {task['query']}\n{self._response_text(response).strip()}"
+
+    def _merge_responses(self, tasks, responses):
+        """Combines the answers of a multi-request message into one reply, one section per request."""
+        return "\n\n".join(self._format_section(task, response) for task, response in zip(tasks, responses))
+
     def handle_query(self, user_query):
-        """Primary interface for main.py"""
+        """Primary interface for main.py (synchronous wrapper around ahandle_query)."""
+        return _run_sync(self.ahandle_query(user_query))
+
+    async def ahandle_query(self, user_query):
+        """Async entry point: many Directors (one per session) can interleave on one event loop."""
+        chunks = [chunk async for chunk in self.astream_query(user_query)]
+        return self.structure_response("".join(chunks))
+
+    def stream_query(self, user_query):
+        """Synchronous generator over astream_query, for printing the reply as it arrives."""
+        stream = self.astream_query(user_query)
+
+        async def next_chunk():
+            return await stream.__anext__()
+
+        while True:
+            try:
+                yield _run_sync(next_chunk())
+            except StopAsyncIteration:
+                return
+
+    async def astream_query(self, user_query):
+        """Routes the query and yields the reply in chunks as soon as they are produced."""
         logging.info("Director received a new query.")
         self.add_to_history("user", user_query)
+        # Set again only once this query has been answered, so a failure never carries the previous turn's agent
+        self.last_used_agent = None
+        self.last_routing_source = None
 
-        analysis = self.analyze_query(user_query)
-        agent_name = analysis.get("agent", "self")
-        query = analysis.get("query", user_query)
+        try:
+            tasks = self._to_tasks(await self.aanalyze_query(user_query))
+        except ValueError:
+            tasks = [{"agent": "self", "query": user_query}]
+            self.last_routing_source = "fallback"
+
+        parts = []
+
+        # Several independent requests: fan out across agents and stream each section once it (and those before it) are done
+        if len(tasks) > 1:
+            logging.info(f"Director fanning out {len(tasks)} tasks.")
+            futures = [asyncio.get_running_loop().create_future() for _ in tasks]
+            runner = asyncio.ensure_future(self._arun_tasks_into(tasks, futures))
+            for index, task in enumerate(tasks):
+                section = self._format_section(task, await futures[index])
+                chunk = section if index == 0 else f"\n\n{section}"
+                parts.append(chunk)
+                yield chunk
+            await runner
+            self.last_used_agent = "+".join(dict.fromkeys(task["agent"] for task in tasks))
+            self.add_to_history("agent", "".join(parts))
+            return
+
+        agent_name = tasks[0].get("agent", "self")
+        query = tasks[0].get("query", user_query)
 
         if agent_name == "self":
-            # Fallback GPT chat
-            messages = [{"role": "user", "content": user_query}]
-            reply = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                temperature=0.7
-            ).choices[0].message.content.strip()
-            self.add_to_history("assistant", reply)
-            return self.structure_response(reply)
+            if "reply" in tasks[0]:
+                # Tool routing already produced the answer in the same request
+                parts.append(tasks[0]["reply"])
+                yield tasks[0]["reply"]
+            else:
+                # Fallback GPT chat
+                async for chunk in self._astream_chat_reply(user_query):
+                    parts.append(chunk)
+                    yield chunk
+            self.last_used_agent = "self"
+            self.add_to_history("assistant", "".join(parts))
+            return
 
         # If specialized agent
-        response = self.call_agent(agent_name, query)
-        self.add_to_history("agent", response)
-        return self.structure_response(response)
+        async for chunk in self.astream_agent(agent_name, query, tasks[0].get("arguments")):
+            parts.append(chunk)
+            yield chunk
+        self.add_to_history("agent", "".join(parts))
+
+    # -------------------- Lifecycle --------------------
+
+    async def aclose(self):
+        """Closes the HTTP clients of the Director and of every agent that was built."""
+        for agent_name, agent in self.agents.loaded().items():
+            if hasattr(agent, "aclose"):
+                try:
+                    await agent.aclose()
+                except Exception as e:
+                    logging.warning(f"Error closing {agent_name} agent: {e}")
+        await self.client.close()
+
+    def close(self):
+        """Synchronous wrapper around aclose."""
+        _run_sync(self.aclose())
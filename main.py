@@ -3,8 +3,9 @@
 import logging
 import sys
 import os
-from director import Director
-from memory.chat_memory import ChatMemory
+import time
+from datetime import datetime, timedelta
+from session_manager import SessionManager
 from auth.token_manager import load_user_credentials
 
 logging.basicConfig(
@@ -40,6 +41,8 @@ System Commands:
 /bye    - Exit the program
 /status - Check agents' status
 /new    - Start new conversation
+/search - Search past conversations, e.g. /search spacex launch agent:websearch since:7d
+          (filters: agent:NAME, since:YYYY-MM-DD or Nd, until:YYYY-MM-DD)
 ----------------------------------------
 """
     print(help_text)
@@ -50,6 +53,47 @@ def show_agent_status(director):
     for agent, active in status.items():
         emoji = "✅" if active else "❌"
         print(f"- {agent.capitalize()}: {emoji} {'Active' if active else 'Inactive'}")
+
+    classifier = director.intent_classifier
+    print("\nRouting:")
+    print(f"- Local classifier: {classifier.stats['hits']}/{classifier.stats['lookups']} hits "
+          f"({classifier.hit_rate:.0%}), threshold {classifier.threshold}")
+    cache = director.route_cache
+    print(f"- Route cache: {cache.stats['hits']} hits, {cache.stats['misses']} misses, "
+          f"{len(cache)}/{cache.max_size} entries")
+    usage = director.prompt_cache_stats
+    print(f"- Prompt cache: {usage['cached_tokens']}/{usage['prompt_tokens']} prompt tokens cached "
+          f"({director.cached_token_ratio:.0%}) over {usage['requests']} routing calls")
+    print()
+
+def _parse_date_filter(value):
+    """Accepts YYYY-MM-DD or a relative "7d" (days ago)."""
+    if value.endswith("d") and value[:-1].isdigit():
+        return (datetime.now() - timedelta(days=int(value[:-1]))).strftime("%Y-%m-%d")
+    return value
+
+def search_history(chat_memory, args):
+    filters = {}
+    words = []
+    for part in args.split():
+        key, _, value = part.partition(":")
+        if key in ("agent", "since", "until") and value:
+            filters[key] = value.lower() if key == "agent" else _parse_date_filter(value)
+        else:
+            words.append(part)
+
+    if not words:
+        print("\nUsage: /search <words> [agent:NAME] [since:YYYY-MM-DD|Nd] [until:YYYY-MM-DD]\n")
+        return
+
+    started = time.perf_counter()
+    results = chat_memory.search(" ".join(words), **filters)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    print(f"\n🔎 {len(results)} result(s) in {elapsed:.1f}ms")
+    for result in results:
+        speaker = "You" if result["role"] == "user" else f"WingMan ({result['agent'] or 'self'})"
+        print(f"- [{result['timestamp'][:16].replace('T', ' ')}] conversation {result['conversation_id']}, {speaker}: {result['snippet']}")
     print()
 
 def main():
@@ -64,12 +108,12 @@ def main():
             # The function raises ValueError if the user is not found
             load_user_credentials(email) 
         except ValueError:
-            print(f"No credentials found for {email} in data/users.json. Please run login.py first.")
+            print(f"No credentials found for {email} in data/users.db. Please run login.py first.")
             return
 
-        chat_memory = ChatMemory(user_email=email)
-        chat_memory.start_new_conversation()
-        director = Director(user_email=email)
+        # Chat history is written behind the REPL; /bye (or exit) flushes it
+        sessions = SessionManager(max_sessions=1, memory_kwargs={"write_behind": True, "search": True, "vectors": True})
+        sessions.get(email)
 
         print("WingMan initialized successfully!")
         print("Type /help for example commands and queries")
@@ -84,41 +128,48 @@ def main():
 
             if command == "/bye":
                 print("WingMan: Goodbye! 👋")
+                sessions.close_all()
                 break
             elif command == "/help":
                 print_help()
                 continue
             elif command == "/status":
-                show_agent_status(director)
+                with sessions.use(email) as session:
+                    show_agent_status(session.director)
+                continue
+            elif command.startswith("/search"):
+                with sessions.use(email) as session:
+                    search_history(session.chat_memory, user_query[len("/search"):].strip())
                 continue
             elif command == "/new":
-                chat_memory.start_new_conversation()
+                with sessions.use(email) as session:
+                    session.chat_memory.start_new_conversation()
                 print("\nWingMan: Started a new conversation! 🆕\n")
                 continue
 
-            # User message -> memory
-            chat_memory.add_message("user", user_query)
-
-            # Prepare context for the Director
-            recent = chat_memory.get_recent_messages()
-            director.conversation_history = [
-                {
-                    "role": msg["role"],
-                    "content": msg["content"],
-                    "timestamp": msg["timestamp"],
-                    "metadata": msg.get("metadata", {})
-                }
-                for msg in recent
-            ]
-
-            # Get response from Director
-            response = director.handle_query(user_query)
-
-            # Assistant response -> memory
-            metadata = {"agent": getattr(director, "last_used_agent", None)}
-            chat_memory.add_message("assistant", response, metadata=metadata)
-
-            print(f"\nWingMan: {response}\n")
+            # One request at a time per session, and no eviction while it runs
+            with sessions.use(email) as session:
+                director, chat_memory = session.director, session.chat_memory
+
+                # User message -> memory
+                chat_memory.add_message("user", user_query)
+
+                # Prepare context for the Director
+                session.sync_history()
+
+                # Stream the Director's response as it arrives
+                chunks = []
+                for chunk in director.stream_query(user_query):
+                    if not chunks:
+                        print("\nWingMan: ", end="", flush=True)
+                    chunks.append(chunk)
+                    print(chunk, end="", flush=True)
+                print("\n")
+                response = director.structure_response("".join(chunks))
+
+                # Assistant response -> memory
+                metadata = {"agent": director.last_used_agent, "routing": director.last_routing_source}
+                chat_memory.add_message("assistant", response, metadata=metadata)
 
     except Exception as e:
         print(f"\n❌ Error initializing WingMan: {str(e)}\n")
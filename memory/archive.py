@@ -0,0 +1,143 @@
+# memory/archive.py
+import json
+import os
+import zlib
+import logging
+import argparse
+import threading
+
+ARCHIVE_DIR = "archive"
+
+
+class ConversationArchive:
+    """
+    Immutable, compressed archive segments for one user's old conversations.
+
+    Each compaction run writes one new segment file and never touches it again. Inside a
+    segment every conversation's JSONL records are compressed as an independent zlib block,
+    so the small index ({conversation id: segment, offset, length, ...}) allows reading any
+    single conversation with one seek and one decompress.
+    """
+
+    def __init__(self, user_email, base_dir="memory"):
+        self.user_email = user_email
+        self.dir_path = os.path.join(base_dir, ARCHIVE_DIR, user_email)
+        self.index_path = os.path.join(base_dir, ARCHIVE_DIR, f"{user_email}.idx.json")
+        self._lock = threading.Lock()
+        self.index = self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return {int(key): entry for key, entry in json.load(f).items()}
+        except Exception as e:
+            logging.error(f"Error loading archive index {self.index_path}: {e}")
+            return {}
+
+    def reload(self):
+        """Re-reads the index, e.g. after another process wrote a segment."""
+        with self._lock:
+            self.index = self._load_index()
+
+    def _save_index(self):
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({str(key): entry for key, entry in self.index.items()}, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.index_path)
+
+    def __contains__(self, conversation_id):
+        return conversation_id in self.index
+
+    def conversations(self):
+        return [
+            {"id": entry_id, "timestamp": entry["timestamp"], "message_count": entry["message_count"], "archived": True}
+            for entry_id, entry in sorted(self.index.items())
+        ]
+
+    def get_summary(self, conversation_id):
+        entry = self.index.get(conversation_id)
+        return entry.get("summary") if entry else None
+
+    def size(self):
+        """Bytes on disk taken by the segments and the index."""
+        total = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        if os.path.isdir(self.dir_path):
+            total += sum(os.path.getsize(os.path.join(self.dir_path, name)) for name in os.listdir(self.dir_path))
+        return total
+
+    def write_segment(self, conversations):
+        """
+        Archives [(conversation metadata, [raw JSONL record lines])] into a new segment.
+        The segment is fsynced before the index that points into it is replaced.
+        Returns the segment path.
+        """
+        os.makedirs(self.dir_path, exist_ok=True)
+        with self._lock:
+            number = max((entry["segment"] for entry in self.index.values()), default=0) + 1
+            segment_path = os.path.join(self.dir_path, f"{number:05d}.seg")
+            entries = {}
+            with open(segment_path, "xb") as f:
+                for meta, lines in conversations:
+                    block = zlib.compress(b"".join(lines), 9)
+                    entries[meta["id"]] = {
+                        "segment": number, "offset": f.tell(), "length": len(block),
+                        "timestamp": meta["timestamp"], "message_count": meta["message_count"],
+                        "summary": meta.get("summary")
+                    }
+                    f.write(block)
+                f.flush()
+                os.fsync(f.fileno())
+            self.index.update(entries)
+            self._save_index()
+        return segment_path
+
+    def read(self, conversation_id):
+        """Decompresses one archived conversation and returns its message dicts."""
+        entry = self.index.get(conversation_id)
+        if not entry:
+            return []
+        segment_path = os.path.join(self.dir_path, f"{entry['segment']:05d}.seg")
+        with open(segment_path, "rb") as f:
+            f.seek(entry["offset"])
+            data = zlib.decompress(f.read(entry["length"]))
+
+        messages = []
+        for line in data.splitlines():
+            record = json.loads(line)
+            if record.pop("type", None) != "message":
+                continue
+            record.pop("conversation_id", None)
+            messages.append(record)
+        return messages
+
+
+def compact_history(base_dir="memory", older_than_days=30, backend="jsonl"):
+    """Compaction job: archives old conversations of every user of `backend` and prints a size report."""
+    from memory.chat_memory import ChatMemory
+
+    reports = []
+    for chat_memory in ChatMemory.load_all(base_dir=base_dir, backend=backend):
+        try:
+            report = chat_memory.compact(older_than_days=older_than_days)
+            reports.append(report)
+            print(
+                f"{chat_memory.user_email}: archived {report['archived']} conversation(s), "
+                f"hot file {report['hot_before']:,} -> {report['hot_after']:,} bytes, "
+                f"archive {report['archive_before']:,} -> {report['archive_after']:,} bytes"
+            )
+        finally:
+            chat_memory.close()
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old WingMan conversations into compressed archive segments.")
+    parser.add_argument("--days", type=int, default=30, help="Archive conversations started more than this many days ago")
+    parser.add_argument("--base-dir", default="memory")
+    parser.add_argument("--backend", default="jsonl", choices=("jsonl", "sqlite"))
+    args = parser.parse_args()
+    compact_history(base_dir=args.base_dir, older_than_days=args.days, backend=args.backend)
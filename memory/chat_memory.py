@@ -1,46 +1,193 @@
 # memory/chat_memory.py
-import json
-import os
+import atexit
 import logging
+import threading
+import time
+import weakref
 from datetime import datetime
 
+from memory.jsonl_store import JsonlStore
+from memory.sqlite_store import SqliteStore
+from memory.context_assembler import message_tokens
+from memory.search_index import SearchIndex
+from memory.vector_memory import VectorMemory
+from memory.routing_log import RoutingLog
+
+# Storage backends, selected with ChatMemory(backend=...)
+BACKENDS = {
+    "jsonl": JsonlStore,
+    "sqlite": SqliteStore,
+}
+
+# When appended messages are forced to stable storage:
+#   "always"   - after every write (every flush, in write-behind mode)
+#   "periodic" - at most every `sync_interval` seconds, and on close
+#   "never"    - left to the OS
+DURABILITY_POLICIES = ("always", "periodic", "never")
+SQLITE_SYNCHRONOUS = {"always": "FULL", "periodic": "NORMAL", "never": "OFF"}
+
+# Write-behind memories still open at interpreter exit get their buffers flushed
+_open_memories = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_open_memories():
+    for memory in list(_open_memories):
+        memory.close()
+
+
 class ChatMemory:
-    def __init__(self, user_email=None, base_dir="memory"):
-        if not os.path.exists(base_dir):
-            os.makedirs(base_dir)
-        file_name = f"{user_email}_chat_history.json" if user_email else "chat_history.json"
-        self.file_path = os.path.join(base_dir, file_name)
-        self.history = self._load_history()
+    """
+    A user's conversations, persisted through a pluggable storage backend.
+
+    "jsonl" (default) keeps one append-only log per user; "sqlite" keeps every user in one
+    WAL-mode database with indexed lookups that several processes can share. With lazy=True
+    (jsonl only) startup reads just the conversation index, and older messages on demand.
+
+    With write_behind=True, add_message only buffers the message; a background thread writes
+    the buffer as one batch every `flush_interval` seconds or once `batch_size` messages are
+    waiting, and close()/interpreter exit flush whatever is left. Reads through ChatMemory
+    always see buffered messages.
+
+    search=True keeps a full-text index of the messages, vectors=True a semantic memory
+    (memory/vector_memory.py) that recall() queries for relevant messages of past conversations.
+    Routing decisions (a user message and the agent that answered it, when the LLM router picked
+    it and the agent succeeded) are also appended to a RoutingLog, which get_routing_examples() reads.
+    """
+
+    def __init__(self, user_email=None, base_dir="memory", backend="jsonl", lazy=True,
+                 write_behind=False, flush_interval=1.0, batch_size=20,
+                 durability="periodic", sync_interval=5.0, search=False, vectors=False):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown ChatMemory backend '{backend}'. Expected one of {tuple(BACKENDS)}.")
+        if durability not in DURABILITY_POLICIES:
+            raise ValueError(f"Unknown durability policy '{durability}'. Expected one of {DURABILITY_POLICIES}.")
+        self.user_email = user_email
+        self.backend = backend
+        options = {"lazy": lazy} if backend == "jsonl" else {"synchronous": SQLITE_SYNCHRONOUS[durability]}
+        self.store = BACKENDS[backend](user_email=user_email, base_dir=base_dir, **options)
         self.current_conversation_id = None
+        self._current_messages = []
+        # Number of messages of the current conversation that precede _current_messages (not loaded)
+        self._current_base = 0
 
-    def _load_history(self):
-        if os.path.exists(self.file_path):
+        self.durability = durability
+        self.sync_interval = sync_interval
+        self._last_sync = time.monotonic()
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        # Serializes flushes so batches reach the store in order
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._flusher = None
+
+        self.routing_log = RoutingLog(user_email, base_dir=base_dir)
+
+        # Full-text index, kept up to date as messages reach the store
+        self.search_index = None
+        if search:
+            self.search_index = SearchIndex.shared(base_dir)
+            self.search_index.catch_up(self)
+        # Embeddings of the messages, for recall()
+        self.vector_memory = None
+        if vectors:
+            self.vector_memory = VectorMemory(user_email, base_dir=base_dir)
+            # Embedding a long backlog takes one API call per batch, so it runs in the background;
+            # recall meanwhile searches whatever is embedded. Only conversations that exist now
+            # are caught up; newer ones are fed by _index().
+            threading.Thread(
+                target=self._catch_up_vectors, args=(self.store.list_conversations(),),
+                name="vector-catch-up", daemon=True
+            ).start()
+        if write_behind:
+            self._flusher = threading.Thread(target=self._flush_loop, name="chat-memory-flush", daemon=True)
+            self._flusher.start()
+            _open_memories.add(self)
+
+    # -------------------- Write-behind --------------------
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Writes buffered messages to the store as one batch per conversation, then applies the durability policy."""
+        with self._flush_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
             try:
-                with open(self.file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                batches = []
+                for conversation_id, message in pending:
+                    if batches and batches[-1][0] == conversation_id:
+                        batches[-1][1].append(message)
+                    else:
+                        batches.append((conversation_id, [message]))
+                for conversation_id, messages in batches:
+                    self.store.append_messages(conversation_id, messages)
+                    self._index(conversation_id, messages)
+                self._maybe_sync()
             except Exception as e:
-                logging.error(f"Error loading chat history: {e}")
-        return {"conversations": []}
+                logging.error(f"Error flushing chat memory for {self.user_email}: {e}")
+                # Keep the unwritten messages for the next attempt
+                with self._pending_lock:
+                    self._pending = pending + self._pending
 
-    def _save_history(self):
+    def _index(self, conversation_id, messages):
+        if self.search_index is not None:
+            try:
+                self.search_index.add_messages(self.user_email, conversation_id, messages)
+            except Exception as e:
+                # The next catch_up() indexes whatever was missed
+                logging.warning(f"Could not index messages for search: {e}")
+        if self.vector_memory is not None:
+            # Messages whose embedding fails stay queued for the next batch
+            self.vector_memory.add(conversation_id, messages)
+
+    def _catch_up_vectors(self, conversations):
         try:
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.history, f, indent=2, ensure_ascii=False)
+            self.vector_memory.catch_up(self, conversations, stop=lambda: self._closed)
         except Exception as e:
-            logging.error(f"Error saving chat history: {e}")
+            logging.warning(f"Could not catch up semantic memory for {self.user_email}: {e}")
+
+    def _maybe_sync(self, force=False):
+        if self.durability == "never":
+            return
+        now = time.monotonic()
+        if force or self.durability == "always" or now - self._last_sync >= self.sync_interval:
+            self.store.sync()
+            self._last_sync = now
+
+    # -------------------- Conversations --------------------
 
     def start_new_conversation(self):
-        new_id = len(self.history["conversations"]) + 1
-        conversation = {
-            "id": new_id,
-            "timestamp": datetime.now().isoformat(),
-            "messages": []
-        }
-        self.history["conversations"].append(conversation)
+        # Buffered messages of the previous conversation must be written before the new one starts
+        self.flush()
+        new_id = self.store.create_conversation(datetime.now().isoformat())
         self.current_conversation_id = new_id
-        self._save_history()
+        self._current_messages = []
+        self._current_base = 0
         return new_id
 
+    def resume_latest_conversation(self, tail=20):
+        """Continues the most recent conversation, loading only its last `tail` messages."""
+        conversations = self.list_conversations()
+        if not conversations:
+            return self.start_new_conversation()
+        latest = conversations[-1]
+        self.current_conversation_id = latest["id"]
+        self._current_messages = self.store.get_messages(latest["id"], limit=tail)
+        # Only the tail is in memory; full reads of this conversation go to storage
+        self._current_base = latest["message_count"] - len(self._current_messages)
+        return latest["id"]
+
     def add_message(self, role, content, metadata=None):
         if not self.current_conversation_id:
             self.start_new_conversation()
@@ -51,10 +198,141 @@ class ChatMemory:
         }
         if metadata:
             message["metadata"] = metadata
-        self.history["conversations"][self.current_conversation_id - 1]["messages"].append(message)
-        self._save_history()
+        # Counted once here and persisted with the message, so context assembly never re-tokenizes it
+        message_tokens(message)
+        self._log_routing(message)
+        self._current_messages.append(message)
+
+        if not self.write_behind:
+            self.store.append_message(self.current_conversation_id, message)
+            self._index(self.current_conversation_id, [message])
+            self._maybe_sync()
+            return
+        with self._pending_lock:
+            self._pending.append((self.current_conversation_id, message))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    @staticmethod
+    def _routing_label(reply):
+        """The agent `reply` can teach the router: only successful routing decisions made by the LLM router count."""
+        metadata = reply.get("metadata") or {}
+        if reply["role"] != "assistant" or metadata.get("routing") != "llm":
+            return None
+        return metadata.get("agent")
+
+    def _log_routing(self, message):
+        agent = self._routing_label(message)
+        if not agent or not self._current_messages:
+            return
+        previous = self._current_messages[-1]
+        if previous["role"] == "user":
+            try:
+                self.routing_log.append(previous["content"], agent)
+            except OSError as e:
+                logging.warning(f"Could not log routing decision: {e}")
 
     def get_recent_messages(self, limit=5):
         if not self.current_conversation_id:
             return []
-        return self.history["conversations"][self.current_conversation_id - 1]["messages"][-limit:]
+        return self._current_messages[-limit:]
+
+    def list_conversations(self):
+        """Conversation ids, start times and message counts."""
+        self.flush()
+        return self.store.list_conversations()
+
+    def get_conversation(self, conversation_id):
+        """All messages of one conversation, read from storage on demand."""
+        if conversation_id == self.current_conversation_id and self._current_base == 0:
+            return list(self._current_messages)
+        self.flush()
+        return self.store.get_messages(conversation_id)
+
+    def get_loaded_messages(self):
+        """(number of earlier messages not loaded, loaded messages) for the current conversation."""
+        return self._current_base, self._current_messages
+
+    def get_summary(self, conversation_id):
+        """The conversation's rolling summary as {"covered": messages folded in, "text": ...}, or None."""
+        return self.store.get_summary(conversation_id)
+
+    def save_summary(self, conversation_id, covered, text):
+        self.store.save_summary(conversation_id, covered, text)
+
+    def is_archived(self, conversation_id):
+        """True when the conversation was compacted into the (read-only) archive."""
+        return self.store.is_archived(conversation_id)
+
+    def get_messages_by_agent(self, agent, limit=20):
+        """The latest assistant messages produced by one agent."""
+        self.flush()
+        return self.store.get_messages_by_agent(agent, limit)
+
+    def search(self, query, agent=None, since=None, until=None, limit=10):
+        """Full-text search over this user's messages (requires search=True)."""
+        if self.search_index is None:
+            raise RuntimeError("Search is not enabled for this ChatMemory (pass search=True).")
+        self.flush()
+        return self.search_index.search(self.user_email, query, agent=agent, since=since, until=until, limit=limit)
+
+    def recall(self, query, k=3, exclude=()):
+        """
+        The `k` messages of other conversations most relevant to `query` (requires vectors=True);
+        `exclude` holds contents already in context.
+        """
+        if self.vector_memory is None:
+            raise RuntimeError("Semantic memory is not enabled for this ChatMemory (pass vectors=True).")
+        self.flush()
+        return self.vector_memory.search(
+            query, k=k, exclude=exclude, exclude_conversation=self.current_conversation_id
+        )
+
+    def compact(self, older_than_days=30):
+        """Archives conversations older than `older_than_days` (never the current one); returns the size report."""
+        self.flush()
+        exclude = {self.current_conversation_id} if self.current_conversation_id else set()
+        return self.store.compact(older_than_days=older_than_days, exclude=exclude)
+
+    def get_routing_examples(self, limit=None):
+        """
+        (user query, agent) pairs for user messages answered by a known agent, oldest first;
+        only the last `limit` when given. Read from the routing log, which is built from the
+        full history the first time.
+        """
+        if not self.routing_log.exists():
+            self.routing_log.rebuild(self._scan_routing_examples())
+        return self.routing_log.read(limit)
+
+    def _scan_routing_examples(self):
+        for conversation in self.list_conversations():
+            messages = self.get_conversation(conversation["id"])
+            for user_msg, reply in zip(messages, messages[1:]):
+                agent = self._routing_label(reply)
+                if user_msg["role"] == "user" and agent:
+                    yield user_msg["content"], agent
+
+    def close(self):
+        """Flushes any buffered messages, syncs them per the durability policy and closes the store."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        _open_memories.discard(self)
+        try:
+            self.flush()
+            self._maybe_sync(force=True)
+            self.store.close()
+            if self.vector_memory is not None:
+                self.vector_memory.close()
+        except Exception as e:
+            logging.warning(f"Error closing chat memory for {self.user_email}: {e}")
+
+    @classmethod
+    def load_all(cls, base_dir="memory", backend="jsonl"):
+        """Returns a ChatMemory for every user with stored history in base_dir."""
+        return [
+            cls(user_email=user_email, base_dir=base_dir, backend=backend)
+            for user_email in BACKENDS[backend].list_users(base_dir)
+        ]
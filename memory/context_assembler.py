@@ -0,0 +1,102 @@
+# memory/context_assembler.py
+import logging
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")  # gpt-4o / gpt-4o-mini
+except Exception:  # tiktoken is optional; fall back to a ~4 characters per token estimate
+    _ENCODING = None
+
+# Chat formatting overhead per message (role, separators)
+MESSAGE_OVERHEAD = 4
+
+# Token budget of the conversation context, shared by ContextAssembler and the Director's routing request
+CONTEXT_TOKENS = 1500
+
+
+def count_tokens(text):
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return max(1, len(text) // 4)
+
+
+def message_tokens(message):
+    """Token count of one message, computed once and cached on the message under "tokens"."""
+    if message.get("tokens") is None:
+        message["tokens"] = count_tokens(message.get("content", "")) + MESSAGE_OVERHEAD
+    return message["tokens"]
+
+
+def select_within_budget(messages, budget):
+    """Index of the oldest message in the longest suffix of `messages` that fits in `budget` tokens (the newest always fits)."""
+    used = 0
+    start = len(messages)
+    for index in range(len(messages) - 1, -1, -1):
+        used += message_tokens(messages[index])
+        if used > budget and index < len(messages) - 1:
+            break
+        start = index
+    return start
+
+
+class ContextAssembler:
+    """
+    Builds the conversation context for the Director by token budget instead of message count.
+
+    The newest messages that fit in `budget` tokens are passed verbatim. Older messages are
+    folded into a rolling summary stored with the conversation: each call only summarizes the
+    messages that dropped out of the window since the last summary, so a long conversation is
+    never re-summarized from the start.
+
+    When the window overflows, the summary is extended down to `low_watermark` of the budget
+    rather than just past the overflow, so the following turns fit again without a summarizer
+    call; the LLM is called once per half a budget of new messages instead of on every turn.
+    """
+
+    def __init__(self, budget=CONTEXT_TOKENS, summarizer=None, low_watermark=0.5):
+        self.budget = budget
+        # summarizer(previous_summary, messages) -> new summary text
+        self.summarizer = summarizer
+        self.low_watermark = low_watermark
+
+    def assemble(self, chat_memory):
+        """Returns the context messages for the active conversation, summary first when there is one."""
+        conversation_id = chat_memory.current_conversation_id
+        if not conversation_id:
+            return []
+
+        base, messages = chat_memory.get_loaded_messages()
+        # The summary needs room too, so it comes out of the same budget
+        summary = chat_memory.get_summary(conversation_id) or {"covered": 0, "text": ""}
+        budget = self.budget - count_tokens(summary["text"])
+        start = select_within_budget(messages, budget)
+
+        # Archived conversations are read-only: they are trimmed to the window, not summarized
+        if self.summarizer and base + start > summary["covered"] and not chat_memory.is_archived(conversation_id):
+            target = base + select_within_budget(messages, int(budget * self.low_watermark))
+            summary = self._extend_summary(chat_memory, conversation_id, summary, base, messages, target)
+
+        # Messages already folded into the summary are not repeated verbatim
+        start = max(start, summary["covered"] - base)
+        context = []
+        if summary["text"] and summary["covered"] > 0:
+            context.append({"role": "system", "content": f"Summary of the earlier conversation: {summary['text']}"})
+        context.extend(messages[start:])
+        return context
+
+    def _extend_summary(self, chat_memory, conversation_id, summary, base, messages, window_start):
+        if summary["covered"] >= base:
+            evicted = messages[summary["covered"] - base:window_start - base]
+        else:
+            # Part of what needs summarizing was never loaded (resumed conversation); read it from storage
+            evicted = chat_memory.get_conversation(conversation_id)[summary["covered"]:window_start]
+        try:
+            text = self.summarizer(summary["text"], evicted)
+        except Exception as e:
+            logging.warning(f"Could not update conversation summary: {e}")
+            return summary
+        summary = {"covered": window_start, "text": text}
+        chat_memory.save_summary(conversation_id, window_start, text)
+        return summary
@@ -0,0 +1,466 @@
+# memory/jsonl_store.py
+import json
+import os
+import re
+import glob
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from memory.archive import ConversationArchive
+from memory.file_lock import FileLock
+
+HISTORY_SUFFIX = "_chat_history.jsonl"
+# Pre-JSONL histories: one indented JSON document rewritten on every message
+LEGACY_SUFFIX = "_chat_history.json"
+
+# Records are written with "type" and the conversation id first, so the index can be built
+# from the head of each line without json-parsing message bodies
+RECORD_HEAD = re.compile(rb'^\{"type":"(conversation|message|summary)","(?:id|conversation_id)":(\d+)')
+
+# Sidecar with the conversation index, so lazy startup only scans records appended after it
+INDEX_SUFFIX = ".idx"
+LOCK_SUFFIX = ".lock"
+INDEX_VERSION = 2
+TAIL_BLOCK = 64 * 1024
+
+
+def _encode(record):
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class JsonlStore:
+    """
+    Per-user chat history stored as an append-only JSON-lines log.
+
+    Every conversation start and every message is one appended line, so writes cost O(1)
+    regardless of history size. At startup only the line heads are scanned to build an
+    index of {conversation id: message offsets}; message bodies are read on demand.
+
+    With lazy=True the index holds only each conversation's byte span and message count. It is
+    loaded from a sidecar file and brought up to date by scanning just the records appended
+    since, so startup cost stays flat as the log grows. Per-message offsets of a conversation
+    are found on demand, and tail reads walk its span backwards from the end.
+
+    compact() moves old conversations into compressed archive segments (see memory/archive.py)
+    and rewrites the log without them; archived conversations stay readable through this store.
+    Appends, reads and compaction all hold an inter-process lock on {log}.lock, and a store
+    whose log was compacted by another process reopens it and rebuilds its index before use.
+    """
+
+    def __init__(self, user_email=None, base_dir="memory", lazy=True):
+        if not os.path.exists(base_dir):
+            os.makedirs(base_dir)
+        file_name = f"{user_email}{HISTORY_SUFFIX}" if user_email else "chat_history.jsonl"
+        self.file_path = os.path.join(base_dir, file_name)
+        self.index_path = self.file_path + INDEX_SUFFIX
+        self.lazy = lazy
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(self.file_path + LOCK_SUFFIX)
+        # {conversation id: {"id", "timestamp", "start", "end", "message_count", "summary",
+        #                    "offsets": [byte offset of each message] or None until needed}}
+        self.conversations = {}
+        self.archive = ConversationArchive(user_email or "chat_history", base_dir)
+
+        legacy_path = self.file_path[:-len(HISTORY_SUFFIX)] + LEGACY_SUFFIX if user_email else os.path.join(base_dir, "chat_history.json")
+        with self._file_lock:
+            if not os.path.exists(self.file_path) and os.path.exists(legacy_path):
+                self._migrate_legacy(legacy_path)
+            self._build_index()
+            self._log = open(self.file_path, "ab")
+
+    @staticmethod
+    def list_users(base_dir="memory"):
+        """Emails of every user with a history file (current or legacy) in base_dir."""
+        emails = set()
+        for suffix in (HISTORY_SUFFIX, LEGACY_SUFFIX):
+            for path in glob.glob(os.path.join(base_dir, f"*{suffix}")):
+                emails.add(os.path.basename(path)[:-len(suffix)])
+        return sorted(emails)
+
+    # -------------------- Index --------------------
+
+    def _migrate_legacy(self, legacy_path):
+        """One-time conversion of a legacy *_chat_history.json file; the original is kept as *.migrated."""
+        try:
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                history = json.load(f)
+        except Exception as e:
+            logging.error(f"Error loading legacy chat history {legacy_path}: {e}")
+            return
+
+        temp_path = self.file_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            for conversation in history.get("conversations", []):
+                f.write(_encode({"type": "conversation", "id": conversation["id"], "timestamp": conversation.get("timestamp")}))
+                for message in conversation.get("messages", []):
+                    f.write(_encode({"type": "message", "conversation_id": conversation["id"], **message}))
+        os.replace(temp_path, self.file_path)
+        os.replace(legacy_path, legacy_path + ".migrated")
+        logging.info(f"✅ Migrated {legacy_path} to {self.file_path}.")
+
+    def _build_index(self):
+        self._indexed_to = 0
+        if not os.path.exists(self.file_path):
+            return
+        self._index_from(self._load_sidecar() if self.lazy else 0)
+
+    def _index_from(self, offset):
+        """Indexes the records from `offset` to the end of the log."""
+        with open(self.file_path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # A crash mid-append leaves a torn last line; drop it so the log stays parseable
+                    logging.warning(f"Discarding incomplete trailing record in {self.file_path}.")
+                    f.close()
+                    os.truncate(self.file_path, offset)
+                    break
+                self._index_record(line, offset)
+                offset += len(line)
+        self._indexed_to = offset
+
+    def _load_sidecar(self):
+        """Loads the saved conversation spans; returns the log offset they cover (0 if unusable)."""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            size = index["size"]
+            if index.get("version") != INDEX_VERSION or size > os.path.getsize(self.file_path):
+                raise ValueError("stale index")
+            if size:
+                # The covered region must still end on a record boundary
+                with open(self.file_path, "rb") as log:
+                    log.seek(size - 1)
+                    if log.read(1) != b"\n":
+                        raise ValueError("stale index")
+        except FileNotFoundError:
+            return 0
+        except Exception as e:
+            logging.warning(f"Rebuilding chat history index for {self.file_path}: {e}")
+            return 0
+
+        for conversation in index["conversations"]:
+            self.conversations[conversation["id"]] = dict(conversation, offsets=None)
+        return size
+
+    def _save_sidecar(self):
+        """Writes the conversation spans next to the log (temp file + rename, so it is never torn)."""
+        index = {
+            "version": INDEX_VERSION,
+            "size": self._indexed_to,
+            "conversations": [
+                {key: c[key] for key in ("id", "timestamp", "start", "end", "message_count", "summary")}
+                for c in self.conversations.values()
+            ]
+        }
+        temp_path = self.index_path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(index, f, separators=(",", ":"))
+            os.replace(temp_path, self.index_path)
+        except Exception as e:
+            logging.error(f"Error saving chat history index: {e}")
+
+    def _index_record(self, line, offset):
+        match = RECORD_HEAD.match(line)
+        if match:
+            kind, conversation_id = match.group(1).decode(), int(match.group(2))
+        else:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f"Skipping unreadable record at offset {offset} in {self.file_path}.")
+                return
+            kind = record.get("type")
+            conversation_id = record.get("id") if kind == "conversation" else record.get("conversation_id")
+
+        if kind == "conversation":
+            record = json.loads(line)
+            self._add_conversation(conversation_id, record.get("timestamp"), offset, offset + len(line))
+        elif kind == "message" and conversation_id in self.conversations:
+            self._add_message_offset(conversation_id, offset, offset + len(line))
+        elif kind == "summary" and conversation_id in self.conversations:
+            # Summaries are rare; the latest one wins
+            record = json.loads(line)
+            self.conversations[conversation_id]["summary"] = {"covered": record["covered"], "text": record["text"]}
+
+    @staticmethod
+    def _record_conversation_id(line):
+        match = RECORD_HEAD.match(line)
+        if match:
+            return int(match.group(2))
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            return None
+        return record.get("id") if record.get("type") == "conversation" else record.get("conversation_id")
+
+    def _add_conversation(self, conversation_id, timestamp, start, end):
+        self.conversations[conversation_id] = {
+            "id": conversation_id, "timestamp": timestamp, "start": start, "end": end,
+            "message_count": 0, "summary": None, "offsets": []
+        }
+
+    def _add_message_offset(self, conversation_id, offset, end):
+        conversation = self.conversations[conversation_id]
+        conversation["end"] = end
+        conversation["message_count"] += 1
+        if conversation["offsets"] is not None:
+            conversation["offsets"].append(offset)
+
+    def _scan_span(self, conversation, start, end):
+        """Yields (offset, line) for the message records of `conversation` within [start, end)."""
+        with open(self.file_path, "rb") as f:
+            f.seek(start)
+            offset = start
+            while offset < end:
+                line = f.readline()
+                if not line:
+                    break
+                match = RECORD_HEAD.match(line)
+                if match and match.group(1) == b"message" and int(match.group(2)) == conversation["id"]:
+                    yield offset, line
+                offset += len(line)
+
+    def _message_offsets(self, conversation):
+        if conversation["offsets"] is None:
+            conversation["offsets"] = [offset for offset, _ in self._scan_span(conversation, conversation["start"], conversation["end"])]
+        return conversation["offsets"]
+
+    def _tail_offsets(self, conversation, limit):
+        """Offsets of the last `limit` messages, reading the conversation's span backwards in blocks."""
+        if conversation["offsets"] is not None:
+            return conversation["offsets"][-limit:]
+
+        found = []
+        start, pos, block = conversation["start"], conversation["end"], TAIL_BLOCK
+        with open(self.file_path, "rb") as f:
+            while pos > start and len(found) < limit:
+                read_from = max(start, pos - block)
+                f.seek(read_from)
+                data = f.read(pos - read_from)
+                if read_from > start:
+                    # The first line of the block may be cut; it is re-read with the next block
+                    cut = data.find(b"\n")
+                    if cut == -1:
+                        block *= 2
+                        continue
+                    data, read_from = data[cut + 1:], read_from + cut + 1
+
+                lines, offset = [], read_from
+                for line in data.splitlines(keepends=True):
+                    lines.append((offset, line))
+                    offset += len(line)
+                for offset, line in reversed(lines):
+                    match = RECORD_HEAD.match(line)
+                    if match and match.group(1) == b"message" and int(match.group(2)) == conversation["id"]:
+                        found.append(offset)
+                        if len(found) == limit:
+                            break
+                pos = read_from
+        return sorted(found)
+
+    def _compacted(self):
+        """True when the log was replaced (compacted by another process) since this store opened it."""
+        try:
+            return not os.path.samestat(os.fstat(self._log.fileno()), os.stat(self.file_path))
+        except FileNotFoundError:
+            return True
+
+    def _refresh(self):
+        """
+        Catches up with other processes: reopens and re-indexes a log they compacted, and
+        indexes records they appended. Call with both locks held.
+        """
+        if self._log.closed:
+            return
+        if self._compacted():
+            logging.info(f"🔄 {self.file_path} was compacted by another process; reloading its index.")
+            self._log.close()
+            self.archive.reload()
+            self.conversations = {}
+            self._build_index()
+            self._log = open(self.file_path, "ab")
+        elif os.fstat(self._log.fileno()).st_size > self._indexed_to:
+            self._index_from(self._indexed_to)
+
+    def _append(self, record):
+        """Appends one record and returns its byte offset. Call with both locks held."""
+        # Another process may have appended since our last write
+        offset = self._log.seek(0, os.SEEK_END)
+        self._log.write(_encode(record))
+        self._log.flush()
+        self._indexed_to = self._log.tell()
+        return offset
+
+    def _read_messages(self, offsets):
+        messages = []
+        with open(self.file_path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                record = json.loads(f.readline())
+                record.pop("type", None)
+                record.pop("conversation_id", None)
+                messages.append(record)
+        return messages
+
+    # -------------------- Store interface --------------------
+
+    def create_conversation(self, timestamp):
+        with self._lock, self._file_lock:
+            self._refresh()
+            new_id = max(max(self.conversations, default=0), max(self.archive.index, default=0)) + 1
+            start = self._append({"type": "conversation", "id": new_id, "timestamp": timestamp})
+            self._add_conversation(new_id, timestamp, start, self._log.tell())
+        return new_id
+
+    def append_message(self, conversation_id, message):
+        self.append_messages(conversation_id, [message])
+
+    def append_messages(self, conversation_id, messages):
+        """Appends a batch of messages with a single write."""
+        records = [_encode({"type": "message", "conversation_id": conversation_id, **message}) for message in messages]
+        with self._lock, self._file_lock:
+            self._refresh()
+            offset = self._log.seek(0, os.SEEK_END)
+            self._log.write(b"".join(records))
+            self._log.flush()
+            self._indexed_to = self._log.tell()
+            for record in records:
+                self._add_message_offset(conversation_id, offset, offset + len(record))
+                offset += len(record)
+
+    def get_summary(self, conversation_id):
+        with self._lock, self._file_lock:
+            self._refresh()
+            conversation = self.conversations.get(conversation_id)
+            if conversation:
+                return conversation["summary"]
+            return self.archive.get_summary(conversation_id)
+
+    def is_archived(self, conversation_id):
+        """True when the conversation was compacted into the archive, which is read-only."""
+        with self._lock, self._file_lock:
+            self._refresh()
+            return conversation_id not in self.conversations and conversation_id in self.archive.index
+
+    def save_summary(self, conversation_id, covered, text):
+        with self._lock, self._file_lock:
+            self._refresh()
+            if conversation_id not in self.conversations:
+                raise ValueError(f"Conversation {conversation_id} is archived or unknown; its summary is read-only.")
+            self._append({"type": "summary", "conversation_id": conversation_id, "covered": covered, "text": text})
+            self.conversations[conversation_id]["summary"] = {"covered": covered, "text": text}
+
+    def sync(self):
+        """Forces appended records to stable storage."""
+        with self._lock:
+            if not self._log.closed:
+                os.fsync(self._log.fileno())
+
+    def list_conversations(self):
+        with self._lock, self._file_lock:
+            self._refresh()
+            hot = [
+                {"id": c["id"], "timestamp": c["timestamp"], "message_count": c["message_count"]}
+                for c in self.conversations.values()
+            ]
+            archived = [c for c in self.archive.conversations() if c["id"] not in self.conversations]
+        return sorted(hot + archived, key=lambda c: c["id"])
+
+    def get_messages(self, conversation_id, limit=None):
+        # Offsets are only valid while no other process can swap the log underneath
+        with self._lock, self._file_lock:
+            self._refresh()
+            conversation = self.conversations.get(conversation_id)
+            if conversation:
+                offsets = self._tail_offsets(conversation, limit) if limit else self._message_offsets(conversation)
+                return self._read_messages(offsets)
+        # Read-through to the archive (segments are immutable, no lock needed)
+        messages = self.archive.read(conversation_id)
+        return messages[-limit:] if limit else messages
+
+    def get_messages_by_agent(self, agent, limit=20):
+        """Latest messages answered by `agent`; the log has no secondary index, so this scans it."""
+        matches = []
+        for conversation in self.list_conversations():
+            for message in self.get_messages(conversation["id"]):
+                if (message.get("metadata") or {}).get("agent") == agent:
+                    matches.append(message)
+        return matches[-limit:]
+
+    def compact(self, older_than_days=30, exclude=()):
+        """
+        Moves conversations started more than `older_than_days` ago (except `exclude`) into a new
+        archive segment and rewrites the log without them. Returns a before/after size report.
+        """
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat()
+        # The file lock keeps every other process from appending to (or reading) the log mid-swap
+        with self._lock, self._file_lock:
+            self._refresh()
+            self._log.flush()
+            report = {
+                "archived": 0, "segment": None,
+                "hot_before": os.path.getsize(self.file_path), "archive_before": self.archive.size()
+            }
+            old = [
+                c for c in self.conversations.values()
+                if c["id"] not in exclude and (c["timestamp"] or "") < cutoff
+            ]
+            if not old:
+                report.update(hot_after=report["hot_before"], archive_after=report["archive_before"])
+                return report
+
+            # 1. Split the log: records of old conversations go to the archive, the rest to the new hot file
+            old_ids = {c["id"] for c in old}
+            archived_lines = {conversation_id: [] for conversation_id in old_ids}
+            temp_path = self.file_path + ".compact"
+            with open(self.file_path, "rb") as source, open(temp_path, "wb") as target:
+                for line in source:
+                    conversation_id = self._record_conversation_id(line)
+                    if conversation_id in old_ids:
+                        archived_lines[conversation_id].append(line)
+                    else:
+                        target.write(line)
+                target.flush()
+                os.fsync(target.fileno())
+
+            # 2. Archive first: a crash before the swap leaves a conversation in both places, never in neither
+            report["segment"] = self.archive.write_segment([(c, archived_lines[c["id"]]) for c in old])
+
+            # 3. Swap in the compacted log and re-index it. Other processes notice the new file on
+            # their next locked access. (On Windows the rename fails while another process holds
+            # the log open; the log is then left as it was and the archived copies are ignored.)
+            self._log.close()
+            try:
+                os.replace(temp_path, self.file_path)
+            except OSError:
+                os.remove(temp_path)
+                self._log = open(self.file_path, "ab")
+                raise
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+            self.conversations = {}
+            self._build_index()
+            self._log = open(self.file_path, "ab")
+            self._save_sidecar()
+
+            report.update(
+                archived=len(old), hot_after=os.path.getsize(self.file_path), archive_after=self.archive.size()
+            )
+        logging.info(
+            f"🗜 Archived {report['archived']} conversation(s) from {self.file_path}: "
+            f"{report['hot_before']:,} -> {report['hot_after']:,} bytes hot, "
+            f"archive {report['archive_before']:,} -> {report['archive_after']:,} bytes."
+        )
+        return report
+
+    def close(self):
+        with self._lock, self._file_lock:
+            if not self._log.closed:
+                # A sidecar for a log that was swapped out would describe the wrong file
+                if not self._compacted():
+                    self._save_sidecar()
+                self._log.close()
+        self._file_lock.close()
@@ -0,0 +1,72 @@
+# memory/routing_log.py
+import os
+import json
+import logging
+import threading
+from collections import deque
+
+ROUTING_DIR = "routing"
+# Bumped when what gets logged changes; logs of older versions are rebuilt from the history
+LOG_VERSION = 2
+
+
+class RoutingLog:
+    """
+    Append-only log of a user's routing decisions: one {"text", "agent"} line per user message
+    the LLM router sent to an agent that answered it, in memory/routing/{email}.v2.jsonl.
+    Decisions of the local classifier are not logged, so it never trains on its own mistakes.
+
+    The IntentClassifier trains from it at session start, which reads one small file instead
+    of the user's whole chat history. A missing log is built once from the history (see
+    ChatMemory.get_routing_examples); until then appends are skipped, since that backfill
+    picks them up from the stored messages.
+    """
+
+    def __init__(self, user_email, base_dir="memory"):
+        dir_path = os.path.join(base_dir, ROUTING_DIR)
+        os.makedirs(dir_path, exist_ok=True)
+        self.path = os.path.join(dir_path, f"{user_email}.v{LOG_VERSION}.jsonl")
+        self._stale_paths = [os.path.join(dir_path, f"{user_email}.jsonl")] + [
+            os.path.join(dir_path, f"{user_email}.v{version}.jsonl") for version in range(2, LOG_VERSION)
+        ]
+        self._lock = threading.Lock()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def append(self, text, agent):
+        if not self.exists():
+            return
+        line = json.dumps({"text": text, "agent": agent}, ensure_ascii=False) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def rebuild(self, examples):
+        """Replaces the log with `examples` ((text, agent) pairs, oldest first)."""
+        tmp_path = self.path + ".tmp"
+        count = 0
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for text, agent in examples:
+                    f.write(json.dumps({"text": text, "agent": agent}, ensure_ascii=False) + "\n")
+                    count += 1
+            os.replace(tmp_path, self.path)
+            for path in self._stale_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+        logging.info(f"🧭 Built routing log {self.path} from {count} past routing decisions.")
+
+    def read(self, limit=None):
+        """(text, agent) pairs, oldest first; only the last `limit` when given."""
+        entries = deque(maxlen=limit)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Torn line from a crash mid-append
+                    entries.append((entry["text"], entry["agent"]))
+        except FileNotFoundError:
+            return []
+        return list(entries)
@@ -0,0 +1,208 @@
+# memory/search_index.py
+import hashlib
+import os
+import re
+import logging
+import sqlite3
+import threading
+import time
+
+DEFAULT_DB = "search_index.db"
+
+# Bumped whenever SCHEMA changes incompatibly; older indexes are dropped and rebuilt by catch_up()
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content,
+    owner,
+    user_email UNINDEXED,
+    conversation_id UNINDEXED,
+    role UNINDEXED,
+    agent UNINDEXED,
+    timestamp UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS indexed_conversations (
+    user_email TEXT NOT NULL,
+    conversation_id INTEGER NOT NULL,
+    message_count INTEGER NOT NULL,
+    PRIMARY KEY (user_email, conversation_id)
+);
+"""
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def owner_token(user_email):
+    """Single FTS token standing for one user, so a MATCH can be scoped to that user's messages."""
+    return "u" + hashlib.sha1(user_email.lower().encode("utf-8")).hexdigest()[:20]
+
+
+def to_match_query(text, user_email):
+    """
+    Turns free text into an FTS5 query over one user's messages: every word must appear in the
+    content (prefix match on the last one).
+    """
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return f'owner : "{owner_token(user_email)}" AND content : ({" ".join(terms)})'
+
+
+class SearchIndex:
+    """
+    SQLite FTS5 full-text index over ChatMemory messages, shared by all users.
+
+    Messages are added as ChatMemory writes them; indexed_conversations records how many
+    messages of each conversation are in the index, so catch_up() only indexes what is new.
+    Searches are always scoped to one user and can filter by agent and timestamp range.
+
+    Each row carries an indexed owner token (see owner_token) that is part of every MATCH, so
+    FTS5 only ever walks the searching user's matches; the user_email check only guards against
+    a hash collision.
+    """
+
+    # How many of the newest matches are ranked by relevance
+    RANK_WINDOW = 1000
+
+    def __init__(self, base_dir="memory", db_name=DEFAULT_DB):
+        if not os.path.exists(base_dir):
+            os.makedirs(base_dir)
+        self.db_path = os.path.join(base_dir, db_name)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+
+    def _migrate(self):
+        """Creates the schema, first dropping an index built with an older SCHEMA_VERSION."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                if version or self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone():
+                    logging.info(f"🔎 Rebuilding search index {self.db_path} (schema v{version} -> v{SCHEMA_VERSION}).")
+                self._conn.execute("DROP TABLE IF EXISTS messages_fts")
+                self._conn.execute("DROP TABLE IF EXISTS indexed_conversations")
+                for statement in SCHEMA.split(";"):
+                    if statement.strip():
+                        self._conn.execute(statement)
+                # The owner column only scopes matches; it must not weigh in on relevance
+                self._conn.execute("INSERT INTO messages_fts (messages_fts, rank) VALUES ('rank', 'bm25(1.0, 0.0)')")
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    @classmethod
+    def shared(cls, base_dir="memory"):
+        """One index (and connection) per database file for the whole process."""
+        path = os.path.abspath(os.path.join(base_dir, DEFAULT_DB))
+        with _shared_lock:
+            if path not in _shared:
+                _shared[path] = cls(base_dir=base_dir)
+            return _shared[path]
+
+    def add_messages(self, user_email, conversation_id, messages):
+        """Indexes newly written messages of one conversation."""
+        if not messages:
+            return
+        owner = owner_token(user_email)
+        rows = [
+            (
+                message["content"], owner, user_email, conversation_id, message["role"],
+                (message.get("metadata") or {}).get("agent"), message["timestamp"]
+            )
+            for message in messages
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO messages_fts (content, owner, user_email, conversation_id, role, agent, timestamp) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.execute(
+                    "INSERT INTO indexed_conversations (user_email, conversation_id, message_count) VALUES (?, ?, ?) "
+                    "ON CONFLICT (user_email, conversation_id) DO UPDATE SET message_count = message_count + excluded.message_count",
+                    (user_email, conversation_id, len(rows))
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def catch_up(self, chat_memory):
+        """Indexes every stored message of the user that is not in the index yet. Returns how many were added."""
+        with self._lock:
+            indexed = dict(self._conn.execute(
+                "SELECT conversation_id, message_count FROM indexed_conversations WHERE user_email = ?",
+                (chat_memory.user_email,)
+            ).fetchall())
+
+        added = 0
+        for conversation in chat_memory.store.list_conversations():
+            done = indexed.get(conversation["id"], 0)
+            if conversation["message_count"] > done:
+                missing = chat_memory.store.get_messages(conversation["id"])[done:]
+                self.add_messages(chat_memory.user_email, conversation["id"], missing)
+                added += len(missing)
+        if added:
+            logging.info(f"🔎 Indexed {added} past messages for {chat_memory.user_email}.")
+        return added
+
+    def search(self, user_email, query, agent=None, since=None, until=None, limit=10):
+        """
+        Best-matching messages of one user. `since`/`until` are ISO date or datetime strings;
+        `agent` matches the metadata agent.
+
+        Only the user's RANK_WINDOW most recent matches are ranked: ranking every match of a broad
+        query costs time linear in the match count, while walking matches newest-first is cheap,
+        and recent messages are what chat searches are usually after.
+        """
+        match = to_match_query(query, user_email)
+        if not match:
+            return []
+
+        where = "messages_fts MATCH ? AND user_email = ?"
+        params = [match, user_email]
+        if agent:
+            where += " AND agent = ?"
+            params.append(agent)
+        if since:
+            where += " AND timestamp >= ?"
+            params.append(since)
+        if until:
+            # A bare date includes the whole day
+            where += " AND timestamp <= ?"
+            params.append(until if "T" in until else until + "T23:59:59.999999")
+
+        started = time.perf_counter()
+        with self._lock:
+            cutoff = self._conn.execute(
+                f"SELECT rowid FROM messages_fts WHERE {where} ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+                params + [self.RANK_WINDOW - 1]
+            ).fetchone()
+            if cutoff:
+                where += " AND rowid >= ?"
+                params.append(cutoff[0])
+            rows = self._conn.execute(
+                "SELECT conversation_id, role, agent, timestamp, "
+                "snippet(messages_fts, 0, '[', ']', '…', 16) AS snippet, rank AS score "
+                f"FROM messages_fts WHERE {where} ORDER BY rank LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        logging.debug(f"Search '{query}' for {user_email} took {(time.perf_counter() - started) * 1000:.1f}ms")
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
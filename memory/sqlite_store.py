@@ -0,0 +1,351 @@
+# memory/sqlite_store.py
+import json
+import os
+import zlib
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+DEFAULT_DB = "chat_memory.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    user_email TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    PRIMARY KEY (user_email, id)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_email TEXT NOT NULL,
+    conversation_id INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    agent TEXT,
+    metadata TEXT,
+    tokens INTEGER
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    user_email TEXT NOT NULL,
+    conversation_id INTEGER NOT NULL,
+    covered INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (user_email, conversation_id)
+);
+CREATE TABLE IF NOT EXISTS archived_conversations (
+    user_email TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    message_count INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (user_email, id)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (user_email, conversation_id, id);
+CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (user_email, timestamp);
+CREATE INDEX IF NOT EXISTS idx_messages_agent ON messages (user_email, agent, id);
+"""
+
+
+class SqliteStore:
+    """
+    Chat history for all users in one SQLite database (WAL mode).
+
+    Recent messages, conversation listings and per-agent lookups are indexed queries, and
+    several processes can read and append to the same database concurrently. New conversation
+    ids are allocated inside a write transaction so two processes never hand out the same one.
+
+    compact() moves old conversations out of the messages table into archived_conversations,
+    one zlib-compressed JSONL blob per conversation; they stay readable through this store.
+    """
+
+    def __init__(self, user_email=None, base_dir="memory", db_name=DEFAULT_DB, synchronous="NORMAL"):
+        if not os.path.exists(base_dir):
+            os.makedirs(base_dir)
+        self.user_email = user_email or ""
+        self.db_path = os.path.join(base_dir, db_name)
+        self._lock = threading.Lock()
+        self._conn = self._connect(self.db_path, synchronous)
+
+        if user_email and not self.list_conversations():
+            self._import_jsonl(base_dir)
+
+    @staticmethod
+    def _connect(db_path, synchronous="NORMAL"):
+        if synchronous not in ("OFF", "NORMAL", "FULL"):
+            raise ValueError(f"Unsupported synchronous mode '{synchronous}'.")
+        # Autocommit mode; writes that need atomicity open their own transaction
+        conn = sqlite3.connect(db_path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+        conn.executescript(SCHEMA)
+        # Databases created before token counts were cached lack the column
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(messages)")}
+        if "tokens" not in columns:
+            conn.execute("ALTER TABLE messages ADD COLUMN tokens INTEGER")
+        return conn
+
+    @staticmethod
+    def list_users(base_dir="memory", db_name=DEFAULT_DB):
+        db_path = os.path.join(base_dir, db_name)
+        if not os.path.exists(db_path):
+            return []
+        conn = sqlite3.connect(db_path, timeout=10)
+        try:
+            return [row[0] for row in conn.execute("SELECT DISTINCT user_email FROM conversations ORDER BY user_email")]
+        finally:
+            conn.close()
+
+    def _import_jsonl(self, base_dir):
+        """Copies an existing JSONL (or legacy JSON) history for this user into the database, once."""
+        from memory.jsonl_store import JsonlStore, HISTORY_SUFFIX, LEGACY_SUFFIX
+
+        paths = [os.path.join(base_dir, f"{self.user_email}{suffix}") for suffix in (HISTORY_SUFFIX, LEGACY_SUFFIX)]
+        if not any(os.path.exists(path) for path in paths):
+            return
+
+        source = JsonlStore(user_email=self.user_email, base_dir=base_dir)
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for conversation in source.list_conversations():
+                        self._conn.execute(
+                            "INSERT OR IGNORE INTO conversations (user_email, id, timestamp) VALUES (?, ?, ?)",
+                            (self.user_email, conversation["id"], conversation["timestamp"] or "")
+                        )
+                        for message in source.get_messages(conversation["id"]):
+                            self._insert_message(conversation["id"], message)
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            logging.info(f"✅ Imported {source.file_path} into {self.db_path}.")
+        finally:
+            source.close()
+
+    def _insert_message(self, conversation_id, message):
+        metadata = message.get("metadata")
+        self._conn.execute(
+            "INSERT INTO messages (user_email, conversation_id, role, content, timestamp, agent, metadata, tokens) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                self.user_email, conversation_id, message["role"], message["content"], message["timestamp"],
+                (metadata or {}).get("agent"), json.dumps(metadata, ensure_ascii=False) if metadata else None,
+                message.get("tokens")
+            )
+        )
+
+    @staticmethod
+    def _row_to_message(row):
+        message = {"role": row["role"], "content": row["content"], "timestamp": row["timestamp"]}
+        if row["metadata"]:
+            message["metadata"] = json.loads(row["metadata"])
+        if row["tokens"] is not None:
+            message["tokens"] = row["tokens"]
+        return message
+
+    # -------------------- Store interface --------------------
+
+    def create_conversation(self, timestamp):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                new_id = self._conn.execute(
+                    "SELECT COALESCE(MAX(id), 0) + 1 FROM (SELECT id FROM conversations WHERE user_email = ? "
+                    "UNION ALL SELECT id FROM archived_conversations WHERE user_email = ?)",
+                    (self.user_email, self.user_email)
+                ).fetchone()[0]
+                self._conn.execute(
+                    "INSERT INTO conversations (user_email, id, timestamp) VALUES (?, ?, ?)",
+                    (self.user_email, new_id, timestamp)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return new_id
+
+    def append_message(self, conversation_id, message):
+        with self._lock:
+            self._insert_message(conversation_id, message)
+
+    def append_messages(self, conversation_id, messages):
+        """Inserts a batch of messages in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for message in messages:
+                    self._insert_message(conversation_id, message)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get_summary(self, conversation_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT covered, text FROM summaries WHERE user_email = ? AND conversation_id = ?",
+                (self.user_email, conversation_id)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def is_archived(self, conversation_id):
+        """True when the conversation was compacted into archived_conversations, which is read-only."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM archived_conversations WHERE user_email = ? AND id = ?", (self.user_email, conversation_id)
+            ).fetchone()
+        return row is not None
+
+    def save_summary(self, conversation_id, covered, text):
+        if self.is_archived(conversation_id):
+            raise ValueError(f"Conversation {conversation_id} is archived; its summary is read-only.")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (user_email, conversation_id, covered, text) VALUES (?, ?, ?, ?)",
+                (self.user_email, conversation_id, covered, text)
+            )
+
+    def sync(self):
+        """Checkpoints the WAL so committed messages are in the main database file."""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def list_conversations(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.id, c.timestamp, "
+                "(SELECT COUNT(*) FROM messages m WHERE m.user_email = c.user_email AND m.conversation_id = c.id) AS message_count "
+                "FROM conversations c WHERE c.user_email = ? ORDER BY c.id",
+                (self.user_email,)
+            ).fetchall()
+            archived = self._conn.execute(
+                "SELECT id, timestamp, message_count FROM archived_conversations WHERE user_email = ? ORDER BY id",
+                (self.user_email,)
+            ).fetchall()
+        conversations = [dict(row) for row in rows] + [dict(row, archived=True) for row in archived]
+        return sorted(conversations, key=lambda c: c["id"])
+
+    def get_messages(self, conversation_id, limit=None):
+        with self._lock:
+            if limit:
+                rows = self._conn.execute(
+                    "SELECT * FROM (SELECT * FROM messages WHERE user_email = ? AND conversation_id = ? "
+                    "ORDER BY id DESC LIMIT ?) ORDER BY id",
+                    (self.user_email, conversation_id, limit)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT * FROM messages WHERE user_email = ? AND conversation_id = ? ORDER BY id",
+                    (self.user_email, conversation_id)
+                ).fetchall()
+        if not rows:
+            # Read-through to the archive
+            messages = self._read_archived(conversation_id)
+            return messages[-limit:] if limit else messages
+        return [self._row_to_message(row) for row in rows]
+
+    def get_messages_by_agent(self, agent, limit=20):
+        """Latest messages answered by `agent`, via the (user, agent) index; archived ones fill in if too few."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM (SELECT * FROM messages WHERE user_email = ? AND agent = ? "
+                "ORDER BY id DESC LIMIT ?) ORDER BY id",
+                (self.user_email, agent, limit)
+            ).fetchall()
+            archived_ids = [] if len(rows) >= limit else [
+                row[0] for row in self._conn.execute(
+                    "SELECT id FROM archived_conversations WHERE user_email = ? ORDER BY id DESC", (self.user_email,)
+                )
+            ]
+        matches = [self._row_to_message(row) for row in rows]
+        for conversation_id in archived_ids:
+            older = [m for m in self._read_archived(conversation_id) if (m.get("metadata") or {}).get("agent") == agent]
+            matches = older + matches
+            if len(matches) >= limit:
+                break
+        return matches[-limit:]
+
+    def _read_archived(self, conversation_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM archived_conversations WHERE user_email = ? AND id = ?",
+                (self.user_email, conversation_id)
+            ).fetchone()
+        if not row:
+            return []
+        return [json.loads(line) for line in zlib.decompress(row[0]).splitlines()]
+
+    def _sizes(self):
+        """(bytes of message text, bytes of archived blobs) stored for this user."""
+        hot = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(CAST(content AS BLOB)) + LENGTH(COALESCE(metadata, ''))), 0) "
+            "FROM messages WHERE user_email = ?", (self.user_email,)
+        ).fetchone()[0]
+        archive = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM archived_conversations WHERE user_email = ?", (self.user_email,)
+        ).fetchone()[0]
+        return hot, archive
+
+    def compact(self, older_than_days=30, exclude=()):
+        """
+        Moves conversations started more than `older_than_days` ago (except `exclude`) into
+        archived_conversations, in one write transaction. Returns the same size report as
+        JsonlStore.compact, measured in stored message bytes (the database file itself only
+        shrinks on VACUUM; freed pages are reused by new messages).
+        """
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                hot_before, archive_before = self._sizes()
+                report = {"archived": 0, "segment": None, "hot_before": hot_before, "archive_before": archive_before}
+                old = [
+                    row for row in self._conn.execute(
+                        "SELECT id, timestamp FROM conversations WHERE user_email = ? AND timestamp < ? ORDER BY id",
+                        (self.user_email, cutoff)
+                    ).fetchall()
+                    if row["id"] not in exclude
+                ]
+                for conversation in old:
+                    messages = [
+                        self._row_to_message(row) for row in self._conn.execute(
+                            "SELECT * FROM messages WHERE user_email = ? AND conversation_id = ? ORDER BY id",
+                            (self.user_email, conversation["id"])
+                        )
+                    ]
+                    data = "".join(json.dumps(message, ensure_ascii=False) + "\n" for message in messages)
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO archived_conversations (user_email, id, timestamp, message_count, data) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (self.user_email, conversation["id"], conversation["timestamp"], len(messages),
+                         zlib.compress(data.encode("utf-8"), 9))
+                    )
+                    self._conn.execute(
+                        "DELETE FROM messages WHERE user_email = ? AND conversation_id = ?", (self.user_email, conversation["id"])
+                    )
+                    self._conn.execute(
+                        "DELETE FROM conversations WHERE user_email = ? AND id = ?", (self.user_email, conversation["id"])
+                    )
+                if old:
+                    report["segment"] = "archived_conversations"
+                hot_after, archive_after = self._sizes()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        report.update(archived=len(old), hot_after=hot_after, archive_after=archive_after)
+        if old:
+            logging.info(
+                f"🗜 Archived {report['archived']} conversation(s) of {self.user_email} in {self.db_path}: "
+                f"{report['hot_before']:,} -> {report['hot_after']:,} message bytes, "
+                f"archive {report['archive_before']:,} -> {report['archive_after']:,} bytes."
+            )
+        return report
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,279 @@
+# memory/vector_memory.py
+import os
+import re
+import json
+import zlib
+import logging
+import threading
+import numpy as np
+from openai import OpenAI
+
+VECTOR_DIR = "vectors"
+
+# Longest message excerpt kept with each vector and returned by recall
+SNIPPET_CHARS = 400
+
+
+class HashingEmbedder:
+    """
+    Offline embeddings: word unigrams and bigrams hashed into a fixed number of signed buckets.
+
+    Uses crc32 rather than hash() so vectors stay comparable across processes. Matches on shared
+    words only, but needs no network and costs microseconds per message.
+    """
+
+    # Cosine similarity from which a message counts as relevant (a few shared words)
+    min_score = 0.15
+
+    def __init__(self, dim=1024):
+        self.dim = dim
+        self.name = f"hash{dim}"
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"\w+", text.lower())
+            for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                h = zlib.crc32(token.encode("utf-8"))
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        # Sublinear term frequency, so a repeated word does not dominate
+        return np.sign(vectors) * np.log1p(np.abs(vectors))
+
+
+class OpenAIEmbedder:
+    """OpenAI embeddings, requested in batches of up to `batch_size` texts per API call."""
+
+    min_score = 0.35
+
+    def __init__(self, model="text-embedding-3-small", dimensions=256, batch_size=100):
+        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.model = model
+        self.dim = dimensions
+        self.batch_size = batch_size
+        self.name = f"{model}-{dimensions}"
+
+    def embed(self, texts):
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            response = self.client.embeddings.create(
+                model=self.model, input=texts[i:i + self.batch_size], dimensions=self.dim
+            )
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def default_embedder():
+    """OpenAI embeddings when an API key is configured, the local hashing embedder otherwise."""
+    return OpenAIEmbedder() if os.getenv("OPENAI_API_KEY") else HashingEmbedder()
+
+
+class VectorMemory:
+    """
+    Per-user semantic memory: one embedding per stored message, searched by cosine similarity.
+
+    Vectors live in memory/vectors/{email}.{embedder}.f16, a flat float16 array appended row
+    by row (np.fromfile loads it in one read), next to a JSONL file with one metadata line per
+    row. Rows are L2-normalized, so a recall is one matrix-vector product over all of them.
+    New messages are embedded in batches of `batch_size` by a background worker; a recall
+    embeds a small remainder still pending together with the query, in the same request.
+    Embedding requests are never made while holding the lock, so adding messages and
+    searching never wait on the network for each other.
+    """
+
+    def __init__(self, user_email, embedder=None, base_dir="memory", batch_size=32):
+        self.user_email = user_email
+        self.embedder = embedder or default_embedder()
+        self.batch_size = batch_size
+        dir_path = os.path.join(base_dir, VECTOR_DIR)
+        os.makedirs(dir_path, exist_ok=True)
+        prefix = os.path.join(dir_path, f"{user_email}.{self.embedder.name}")
+        self.vectors_path = prefix + ".f16"
+        self.meta_path = prefix + ".meta.jsonl"
+        self._lock = threading.Lock()
+        self._pending = []
+        # Messages remembered per conversation, so catch_up() only embeds what is new
+        self.counts = {}
+        # Conversations fed by add() since startup; catch_up() leaves those to it
+        self._live = set()
+        self._load()
+        self._wake = threading.Event()
+        self._closed = False
+        self._worker = threading.Thread(target=self._embed_loop, name="vector-embed", daemon=True)
+        self._worker.start()
+
+    def _load(self):
+        self.meta = []
+        lines = 0
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        self.meta.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break  # Torn last line
+        dim = self.embedder.dim
+        vectors = np.zeros((0, dim), dtype=np.float32)
+        if os.path.exists(self.vectors_path):
+            raw = np.fromfile(self.vectors_path, dtype=np.float16)
+            vectors = raw[:raw.size - raw.size % dim].reshape(-1, dim).astype(np.float32)
+        # A crash between the two appends leaves one file ahead; cut both back to the rows they share
+        rows = min(len(self.meta), vectors.shape[0])
+        if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) > rows * dim * 2:
+            os.truncate(self.vectors_path, rows * dim * 2)
+        self.meta = self.meta[:rows]
+        if lines > rows:
+            with open(self.meta_path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in self.meta)
+        self._vectors = vectors[:rows]
+        self._conversation_ids = np.array([entry["conversation_id"] for entry in self.meta], dtype=np.int64)
+        self._count = rows
+        for entry in self.meta:
+            self.counts[entry["conversation_id"]] = max(self.counts.get(entry["conversation_id"], 0), entry["position"] + 1)
+
+    def __len__(self):
+        return self._count + len(self._pending)
+
+    def add(self, conversation_id, messages):
+        """Queues messages for embedding; embeds and stores them once `batch_size` are waiting."""
+        with self._lock:
+            self._live.add(conversation_id)
+            self._queue(conversation_id, messages)
+
+    def _queue(self, conversation_id, messages):
+        for message in messages:
+            position = self.counts.get(conversation_id, 0)
+            self.counts[conversation_id] = position + 1
+            if message.get("content", "").strip():
+                self._pending.append({
+                    "conversation_id": conversation_id, "position": position, "role": message["role"],
+                    "timestamp": message.get("timestamp"), "content": message["content"][:SNIPPET_CHARS]
+                })
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    def catch_up(self, chat_memory, conversations=None, stop=None):
+        """
+        Queues the stored messages of `conversations` (default: all of the user's, as listed by
+        the store) that have no vector yet, one conversation at a time so add() and search()
+        are not held up. Conversations that add() has fed since startup are skipped. Stops
+        early once `stop()` returns True. Returns how many messages were queued.
+        """
+        if conversations is None:
+            conversations = chat_memory.store.list_conversations()
+        added = 0
+        for conversation in conversations:
+            if stop and stop():
+                break
+            conversation_id, done = conversation["id"], self.counts.get(conversation["id"], 0)
+            if conversation["message_count"] <= done or conversation_id in self._live:
+                continue
+            missing = chat_memory.store.get_messages(conversation_id)[done:conversation["message_count"]]
+            with self._lock:
+                if conversation_id in self._live or self.counts.get(conversation_id, 0) != done:
+                    continue
+                self._queue(conversation_id, missing)
+            added += len(missing)
+        if added:
+            logging.info(f"🧠 Queued {added} past messages for semantic memory of {self.user_email}.")
+        return added
+
+    def _embed_loop(self):
+        while not self._closed:
+            self._wake.wait()
+            self._wake.clear()
+            while not self._closed and len(self._pending) >= self.batch_size:
+                try:
+                    self._embed_pending(limit=self.batch_size * 4)
+                except Exception:
+                    break  # Already logged; stays queued until the next wake-up
+
+    def _embed_pending(self, extra=(), limit=None):
+        """
+        Embeds up to `limit` pending messages (plus `extra` texts, whose vectors are returned) in
+        one call. The request runs outside the lock; only taking the batch and storing it lock.
+        """
+        with self._lock:
+            take = len(self._pending) if limit is None else limit
+            pending, self._pending = self._pending[:take], self._pending[take:]
+        texts = [entry["content"] for entry in pending] + list(extra)
+        if not texts:
+            return np.zeros((0, self.embedder.dim), dtype=np.float32)
+        try:
+            vectors = self.embedder.embed(texts)
+        except Exception as e:
+            logging.warning(f"Embedding request failed, will retry with the next batch: {e}")
+            with self._lock:
+                self._pending = pending + self._pending
+            raise
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        if pending:
+            with self._lock:
+                self._store(pending, vectors[:len(pending)])
+        return vectors[len(pending):]
+
+    def _store(self, entries, vectors):
+        with open(self.vectors_path, "ab") as f:
+            vectors.astype(np.float16).tofile(f)
+        with open(self.meta_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+
+        # Grow the in-memory arrays geometrically instead of copying them on every batch
+        needed = self._count + len(entries)
+        if needed > self._vectors.shape[0]:
+            capacity = max(needed, 2 * self._count, 256)
+            grown = np.zeros((capacity, self.embedder.dim), dtype=np.float32)
+            grown[:self._count] = self._vectors[:self._count]
+            self._vectors = grown
+            grown_ids = np.zeros(capacity, dtype=np.int64)
+            grown_ids[:self._count] = self._conversation_ids[:self._count]
+            self._conversation_ids = grown_ids
+        self._vectors[self._count:needed] = vectors
+        self._conversation_ids[self._count:needed] = [entry["conversation_id"] for entry in entries]
+        self._count = needed
+        self.meta.extend(entries)
+
+    def flush(self):
+        try:
+            self._embed_pending()
+        except Exception:
+            pass  # Already logged; stays queued
+
+    def search(self, query, k=3, min_score=None, exclude=(), exclude_conversation=None):
+        """
+        The `k` stored messages most similar to `query` with a cosine similarity of at least
+        `min_score` (the embedder's default if None), best first. Messages whose content is in
+        `exclude`, or that belong to `exclude_conversation`, are skipped.
+        """
+        if min_score is None:
+            min_score = self.embedder.min_score
+        try:
+            # A large backlog (e.g. during catch-up) is left to the worker rather than delaying the recall
+            query_vector = self._embed_pending(extra=[query], limit=self.batch_size)[0]
+        except Exception:
+            return []
+        with self._lock:
+            if not self._count:
+                return []
+            scores = self._vectors[:self._count] @ query_vector
+            if exclude_conversation is not None:
+                scores[self._conversation_ids[:self._count] == exclude_conversation] = -np.inf
+            exclude = {text[:SNIPPET_CHARS] for text in exclude}
+            # Pick from a few extra candidates in case some are excluded
+            candidates = min(self._count, k + len(exclude))
+            top = np.argpartition(-scores, candidates - 1)[:candidates]
+            results = []
+            for index in top[np.argsort(-scores[top])]:
+                if scores[index] < min_score or len(results) == k:
+                    break
+                entry = self.meta[index]
+                if entry["content"] in exclude:
+                    continue
+                results.append(dict(entry, score=float(scores[index])))
+            return results
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self.flush()
@@ -0,0 +1,199 @@
+# routing/intent_classifier.py
+import math
+import re
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Matches the `- "example query"` lines inside the Director's agent descriptions
+EXAMPLE_PATTERN = re.compile(r'^\s*-\s*"(.+?)"\s*$', re.MULTILINE)
+
+
+# Conjunctions and separators that usually join several requests in one message
+MULTI_INTENT_PATTERN = re.compile(r"\b(and|also|then|plus|as well as)\b|[;&]|\?.+\?", re.IGNORECASE)
+
+
+def extract_examples(description: str) -> List[str]:
+    """Pulls the quoted example queries out of an agent description block."""
+    return EXAMPLE_PATTERN.findall(description)
+
+
+def looks_multi_intent(text: str) -> bool:
+    """True when a message may hold several requests; those are left to the multi-intent LLM router."""
+    return bool(MULTI_INTENT_PATTERN.search(text))
+
+
+class IntentClassifier:
+    """
+    CPU-only character n-gram TF-IDF classifier that routes queries to agents locally.
+
+    Each agent is represented by the centroid of its training examples. A query is
+    only answered locally when its best cosine score clears `threshold` AND beats the
+    runner-up by `margin`; otherwise `predict` returns None and the Director falls back
+    to the LLM.
+
+    Learned examples are deduplicated and capped at `max_examples` per agent (oldest learned
+    ones go first; pinned seed examples stay). Predictions use the last fitted model: once
+    `refit_every` examples have been added, a background thread refits and swaps the model in,
+    so a prediction never pays for a refit after the first one.
+    """
+
+    def __init__(self, threshold: float = 0.45, margin: float = 0.1, ngram_range=(2, 4),
+                 max_examples: int = 200, refit_every: int = 20):
+        self.threshold = threshold
+        self.margin = margin
+        self.ngram_range = ngram_range
+        self.max_examples = max_examples
+        self.refit_every = refit_every
+        self.examples: Dict[str, List[str]] = defaultdict(list)
+        self._pinned: Dict[str, int] = defaultdict(int)  # Leading examples per label never evicted
+        self._seen = set()  # (label, normalized text)
+        self._lock = threading.Lock()
+        # (IDF weights, per-agent centroids), replaced as a whole by fit()
+        self._model: Tuple[Dict[str, float], Dict[str, Dict[str, float]]] = ({}, {})
+        self._fitted = False
+        self._unfitted = 0  # Examples added since the last fit
+        self._refitting = False
+        self.stats = {"lookups": 0, "hits": 0}
+
+    # -------------------- Training --------------------
+
+    def _ngrams(self, text: str) -> Counter:
+        text = " " + re.sub(r"\s+", " ", text.lower()).strip() + " "
+        low, high = self.ngram_range
+        grams = Counter()
+        for n in range(low, high + 1):
+            for i in range(len(text) - n + 1):
+                grams[text[i:i + n]] += 1
+        return grams
+
+    def add_example(self, text: str, label: str, pinned: bool = False) -> bool:
+        """
+        Adds one labelled query unless it is already known; pinned examples are never evicted.
+        Returns whether it was added. Refits in the background every `refit_every` additions.
+        """
+        if not text or not label:
+            return False
+        key = (label, re.sub(r"\s+", " ", text.lower()).strip())
+        with self._lock:
+            if key in self._seen:
+                return False
+            self._seen.add(key)
+            examples = self.examples[label]
+            if pinned:
+                examples.insert(self._pinned[label], text)
+                self._pinned[label] += 1
+            else:
+                examples.append(text)
+                if len(examples) > max(self.max_examples, self._pinned[label] + 1):
+                    evicted = examples.pop(self._pinned[label])
+                    self._seen.discard((label, re.sub(r"\s+", " ", evicted.lower()).strip()))
+            self._unfitted += 1
+            refit = self._fitted and self._unfitted >= self.refit_every and not self._refitting
+            if refit:
+                self._refitting = True
+        if refit:
+            threading.Thread(target=self._background_fit, name="intent-refit", daemon=True).start()
+        return True
+
+    def add_examples(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        return sum(self.add_example(text, label) for text, label in pairs)
+
+    def _background_fit(self):
+        try:
+            self.fit()
+        except Exception as e:
+            logging.warning(f"IntentClassifier refit failed: {e}")
+        finally:
+            self._refitting = False
+
+    def fit(self):
+        """Recomputes IDF weights and per-agent centroids from the stored examples, then swaps them in."""
+        with self._lock:
+            snapshot = {label: list(texts) for label, texts in self.examples.items()}
+            self._unfitted = 0
+        documents = [(label, self._ngrams(text)) for label, texts in snapshot.items() for text in texts]
+        doc_freq = Counter()
+        for _, grams in documents:
+            doc_freq.update(grams.keys())
+
+        total = len(documents)
+        idf = {gram: math.log((1 + total) / (1 + df)) + 1 for gram, df in doc_freq.items()}
+
+        sums: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for label, grams in documents:
+            for gram, weight in self._normalize(self._weigh(grams, idf)).items():
+                sums[label][gram] += weight
+        centroids = {label: self._normalize(vector) for label, vector in sums.items()}
+        # One tuple assignment, so a concurrent prediction never mixes old IDF with new centroids
+        self._model = (idf, centroids)
+        self._fitted = True
+        logging.debug(f"IntentClassifier fitted on {total} examples across {len(centroids)} agents.")
+
+    @staticmethod
+    def _weigh(grams: Counter, idf: Dict[str, float]) -> Dict[str, float]:
+        # Unknown n-grams carry no information about any agent, so they are dropped
+        return {gram: (1 + math.log(count)) * idf[gram] for gram, count in grams.items() if gram in idf}
+
+    @staticmethod
+    def _normalize(vector: Dict[str, float]) -> Dict[str, float]:
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        if not norm:
+            return {}
+        return {gram: w / norm for gram, w in vector.items()}
+
+    # -------------------- Prediction --------------------
+
+    def scores(self, text: str) -> List[Tuple[str, float]]:
+        """Returns (agent, cosine score) pairs sorted from best to worst."""
+        if not self._fitted:
+            self.fit()
+        idf, centroids = self._model
+        query = self._normalize(self._weigh(self._ngrams(text), idf))
+        ranked = [
+            (label, sum(weight * centroid.get(gram, 0.0) for gram, weight in query.items()))
+            for label, centroid in centroids.items()
+        ]
+        return sorted(ranked, key=lambda item: item[1], reverse=True)
+
+    def predict(self, text: str, allowed: Optional[Iterable[str]] = None) -> Optional[Tuple[str, float]]:
+        """Returns (agent, confidence) when confident, otherwise None."""
+        self.stats["lookups"] += 1
+        ranked = self.scores(text)
+        if allowed is not None:
+            allowed = set(allowed)
+            ranked = [item for item in ranked if item[0] in allowed]
+        if not ranked:
+            return None
+
+        best_label, best_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if best_score < self.threshold or best_score - runner_up < self.margin:
+            return None
+
+        self.stats["hits"] += 1
+        return best_label, best_score
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["lookups"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    # -------------------- Retraining --------------------
+
+    def retrain_from_memory(self, chat_memories) -> int:
+        """
+        Adds the routing decisions logged in ChatMemory histories as training examples.
+        Only labels the classifier already knows are kept, so stale or unknown agents are ignored.
+        Returns the number of examples added.
+        """
+        # Older decisions would only be evicted by the per-agent cap again
+        limit = self.max_examples * len(self.examples)
+        added = 0
+        for chat_memory in chat_memories:
+            for text, label in chat_memory.get_routing_examples(limit=limit):
+                if label in self.examples and self.add_example(text, label):
+                    added += 1
+        logging.info(f"IntentClassifier retrained with {added} logged routing decisions.")
+        return added
@@ -0,0 +1,99 @@
+# routing/route_cache.py
+import copy
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases, drops punctuation and collapses whitespace so trivially different phrasings share a key."""
+    query = re.sub(r"[^\w\s@.]", " ", query.lower())
+    return re.sub(r"\s+", " ", query).strip(" .")
+
+
+# Pronouns, back-references and follow-up words whose meaning comes from the previous turns
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(he|him|his|she|her|hers|they|them|their|it|its|that|this|those|these|there|same|again|"
+    r"previous|last one|above|earlier|instead|reply|respond|forward|answer|yes|no|ok|okay|sure)\b",
+    re.IGNORECASE,
+)
+
+
+def looks_context_dependent(query: str) -> bool:
+    """True when a query may only make sense given the previous turns (pronouns, follow-ups, very short replies)."""
+    return len(normalize_query(query).split()) < 3 or bool(FOLLOW_UP_PATTERN.search(query))
+
+
+def context_fingerprint(parts: Iterable) -> str:
+    """Short stable hash of whatever context the routing decision depends on."""
+    return hashlib.sha1(repr(tuple(parts)).encode("utf-8")).hexdigest()[:16]
+
+
+class RouteCache:
+    """
+    Bounded LRU + TTL cache of Director routing results.
+
+    Entries are keyed on (normalized query, context fingerprint). The whole cache is dropped
+    whenever the set of agents it was filled for changes, since a route to an agent the user
+    no longer has (or a missed route to a new one) would be wrong.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 15 * 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._agent_signature = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def _key(self, query: str, context: str):
+        return normalize_query(query), context
+
+    def validate_agents(self, agent_names: Iterable[str]):
+        """Clears the cache if the available agents changed since it was filled."""
+        signature = frozenset(agent_names)
+        with self._lock:
+            if signature != self._agent_signature:
+                if self._entries:
+                    self.stats["invalidations"] += 1
+                self._entries.clear()
+                self._agent_signature = signature
+
+    def get(self, query: str, context: str = "") -> Optional[dict]:
+        key = self._key(query, context)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+
+            stored_at, result = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            # Callers may mutate the result, so never hand out the cached object itself
+            return copy.deepcopy(result)
+
+    def put(self, query: str, result: dict, context: str = ""):
+        key = self._key(query, context)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,235 @@
+# session_manager.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from director import Director
+from memory.chat_memory import ChatMemory
+from memory.context_assembler import ContextAssembler
+from auth.token_manager import user_exists
+from auth.token_refresher import TokenRefresher
+
+
+class Session:
+    """One user's Director + ChatMemory pair, plus the bookkeeping the pool needs."""
+
+    def __init__(self, user_email, director, chat_memory):
+        self.user_email = user_email
+        self.director = director
+        self.chat_memory = chat_memory
+        self.context = ContextAssembler(budget=director.ROUTING_CONTEXT_TOKENS, summarizer=director.summarize_history)
+        if chat_memory.vector_memory is not None:
+            director.recall = chat_memory.recall
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        # A Director keeps per-conversation state, so one user's turns must not interleave
+        self.lock = threading.Lock()
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+    def sync_history(self):
+        """Copies the token-budgeted context (rolling summary + latest messages) into the Director."""
+        self.director.conversation_history = [
+            {
+                "role": msg["role"],
+                "content": msg["content"],
+                "timestamp": msg.get("timestamp"),
+                "metadata": msg.get("metadata", {}),
+                "tokens": msg.get("tokens")
+            }
+            for msg in self.context.assemble(self.chat_memory)
+        ]
+
+    def close(self):
+        # Memory first: with write-behind it still holds unwritten messages, which must not be
+        # lost because closing the Director's HTTP clients failed
+        try:
+            self.chat_memory.close()
+        except Exception as e:
+            logging.warning(f"Error closing chat memory for {self.user_email}: {e}")
+        try:
+            self.director.close()
+        except Exception as e:
+            logging.warning(f"Error closing director for {self.user_email}: {e}")
+
+
+class SessionManager:
+    """
+    Bounded pool of per-user sessions for serving many users from one process.
+
+    Sessions are built on demand from token_manager credentials, reused across requests and
+    evicted least-recently-used once the pool is full, or once they sit idle longer than
+    `idle_ttl` seconds. Evicted sessions close their HTTP clients and are transparently
+    rebuilt the next time their user shows up.
+
+    While a session is pooled, a TokenRefresher renews its Google token `refresh_margin`
+    seconds before it expires (None disables background refreshing).
+    """
+
+    def __init__(self, max_sessions=200, idle_ttl=30 * 60, director_kwargs=None, memory_kwargs=None, refresh_margin=600):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.director_kwargs = director_kwargs or {}
+        self.memory_kwargs = memory_kwargs or {}
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self._reaper = None
+        self._stop = threading.Event()
+        self.stats = {"hits": 0, "builds": 0, "evictions": 0, "expirations": 0}
+        self.token_refresher = None
+        if refresh_margin is not None:
+            self.token_refresher = TokenRefresher(margin=timedelta(seconds=refresh_margin))
+
+    def _build_session(self, user_email):
+        if not user_exists(user_email):
+            raise ValueError(f"User {user_email} not found in user database.")
+        started = time.perf_counter()
+        chat_memory = ChatMemory(user_email=user_email, **self.memory_kwargs)
+        chat_memory.start_new_conversation()
+        director = Director(user_email=user_email, **self.director_kwargs)
+        # Teach the local router from this user's past routing decisions
+        director.intent_classifier.retrain_from_memory([chat_memory])
+        logging.info(f"✅ Session for {user_email} built in {time.perf_counter() - started:.2f}s.")
+        return Session(user_email, director, chat_memory)
+
+    def get(self, user_email):
+        """Returns the user's session, building it if it is not pooled (raises ValueError for unknown users)."""
+        with self._lock:
+            session = self._sessions.get(user_email)
+            if session is not None:
+                self._sessions.move_to_end(user_email)
+                session.touch()
+                self.stats["hits"] += 1
+                return session
+            build_lock = self._build_locks.setdefault(user_email, threading.Lock())
+
+        # Build outside the pool lock so other users are not blocked; concurrent requests for
+        # the same user wait for a single build
+        try:
+            with build_lock:
+                with self._lock:
+                    session = self._sessions.get(user_email)
+                if session is None:
+                    session = self._build_session(user_email)
+                    with self._lock:
+                        self._sessions[user_email] = session
+                        self.stats["builds"] += 1
+                        evicted = self._pop_overflow(keep=user_email)
+                    if self.token_refresher:
+                        self.token_refresher.track(user_email, session.director.google_credentials)
+                        self.token_refresher.start()
+                    for old in evicted:
+                        self._close(old)
+        finally:
+            # Also after a failed build, or unknown users would leave one lock each behind
+            with self._lock:
+                if self._build_locks.get(user_email) is build_lock:
+                    del self._build_locks[user_email]
+        session.touch()
+        return session
+
+    @contextmanager
+    def use(self, user_email):
+        """
+        The user's session, locked for the duration of one request: turns of the same user run
+        one at a time, and the pool does not evict a session while a request holds it.
+        """
+        while True:
+            session = self.get(user_email)
+            session.lock.acquire()
+            with self._lock:
+                pooled = self._sessions.get(user_email) is session
+            if pooled:
+                break
+            # Evicted between get() and acquire(); take the rebuilt one
+            session.lock.release()
+        try:
+            yield session
+        finally:
+            session.touch()
+            session.lock.release()
+            # Trim what the pool ran over by while sessions were busy
+            if len(self._sessions) > self.max_sessions:
+                with self._lock:
+                    evicted = self._pop_overflow()
+                for old in evicted:
+                    self._close(old)
+
+    def _pop_overflow(self, keep=None):
+        """Pops least recently used sessions down to max_sessions, skipping ones serving a request (and `keep`'s)."""
+        evicted = []
+        for user_email, session in list(self._sessions.items()):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if user_email == keep or session.lock.locked():
+                continue  # The pool runs over until the request finishes
+            del self._sessions[user_email]
+            self.stats["evictions"] += 1
+            logging.info(f"🔄 Evicting least recently used session for {user_email}.")
+            evicted.append(session)
+        return evicted
+
+    def _close(self, session):
+        if self.token_refresher:
+            self.token_refresher.untrack(session.user_email)
+        # A request may have taken the session just before it was unpooled; let it finish
+        with session.lock:
+            session.close()
+
+    def evict(self, user_email):
+        """Closes and drops one user's session, if pooled."""
+        with self._lock:
+            session = self._sessions.pop(user_email, None)
+        if session is not None:
+            self._close(session)
+
+    def evict_idle(self):
+        """Closes every session idle for longer than idle_ttl. Returns how many were evicted."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                email for email, session in self._sessions.items()
+                if now - session.last_used > self.idle_ttl and not session.lock.locked()
+            ]
+            sessions = [self._sessions.pop(email) for email in expired]
+            self.stats["expirations"] += len(sessions)
+        for session in sessions:
+            logging.info(f"🔄 Evicting idle session for {session.user_email}.")
+            self._close(session)
+        return len(sessions)
+
+    def start_reaper(self, interval=60):
+        """Runs evict_idle every `interval` seconds on a daemon thread."""
+        if self._reaper and self._reaper.is_alive():
+            return self._reaper
+
+        def reap():
+            while not self._stop.wait(interval):
+                self.evict_idle()
+
+        self._stop.clear()
+        self._reaper = threading.Thread(target=reap, name="session-reaper", daemon=True)
+        self._reaper.start()
+        return self._reaper
+
+    def close_all(self):
+        """Stops the reaper and the token refresher, and closes every pooled session."""
+        self._stop.set()
+        if self.token_refresher:
+            self.token_refresher.stop()
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            self._close(session)
+
+    def __contains__(self, user_email):
+        return user_email in self._sessions
+
+    def __len__(self):
+        return len(self._sessions)